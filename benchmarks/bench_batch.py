@@ -0,0 +1,50 @@
+"""
+A game turn of draw 2, discard 1 into a named pile and shuffle: three
+requests against one POST to /api/deck/<uuid>/batch.
+
+    python benchmarks/bench_batch.py
+"""
+from __future__ import print_function
+
+import json
+
+from common import bench, header, setup_database
+
+from django.core.urlresolvers import reverse
+from django.test import Client
+
+from deck.models import DeckModel
+
+DISCARD = [{'rank': 2, 'suit': "Clubs"}]
+TURN = [{'op': "draw", 'count': 2},
+        {'op': "discard", 'into': "mine", 'cards': DISCARD},
+        {'op': "shuffle"}]
+
+
+def turns():
+    setup_database()
+    client = Client()
+
+    for n in (1, 8):
+        header("n={}".format(n))
+        id = DeckModel.create_deck(n=n).id
+
+        def separate():
+            client.put(reverse('api:deck_draw', args=(id,)) + '?count=2')
+            client.put(reverse('api:deck_discard', args=(id,)) + '?into=mine',
+                       data=json.dumps(DISCARD),
+                       content_type='application/json')
+            client.put(reverse('api:deck_shuffle', args=(id,)))
+
+        def batch():
+            client.post(reverse('api:deck_batch', args=(id,)),
+                        data=json.dumps(TURN),
+                        content_type='application/json')
+
+        bench("before: 3 requests", separate, number=n * 52 // 4, repeat=1)
+        id = DeckModel.create_deck(n=n).id
+        bench("after: 1 batch request", batch, number=n * 52 // 4, repeat=1)
+
+
+if __name__ == '__main__':
+    turns()
@@ -0,0 +1,39 @@
+"""
+Creating decks: N sequential POSTs to /api/deck/new against one POST to
+/api/deck/new/bulk?decks=N.
+
+    python benchmarks/bench_bulk.py
+"""
+from __future__ import print_function
+
+from common import bench, header, setup_database
+
+from django.core.urlresolvers import reverse
+from django.test import Client
+
+from deck.models import deck_cache
+
+
+def creating():
+    setup_database()
+    client = Client()
+    create_url = reverse('api:deck_create')
+    bulk_url = reverse('api:deck_bulk_create')
+
+    for n in (10, 100, 1000):
+        header("decks={}".format(n))
+
+        def sequential():
+            for i in range(n):
+                client.post(create_url)
+            deck_cache.clear()
+
+        bench("before: {} POSTs to /deck/new".format(n), sequential,
+              number=1, repeat=3)
+        bench("after: 1 POST to /deck/new/bulk",
+              lambda: client.post(bulk_url + '?decks={}'.format(n)),
+              number=1, repeat=3)
+
+
+if __name__ == '__main__':
+    creating()
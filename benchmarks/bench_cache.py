@@ -0,0 +1,32 @@
+"""
+Getting decks: reading and decoding the row every time against reading
+through the in-process deck cache.
+
+    python benchmarks/bench_cache.py
+"""
+from __future__ import print_function
+
+from common import bench, header, setup_database
+
+from deck.models import Deck, DeckModel, deck_cache
+
+
+def getting():
+    setup_database()
+
+    for n in (1, 8, 100):
+        header("n={}".format(n))
+        deck = DeckModel.create_deck(n=n)
+
+        bench("before: get, cache miss",
+              lambda: (deck_cache.invalidate(deck.id), Deck.get(deck.id)))
+        bench("after: get, cache hit", lambda: Deck.get(deck.id))
+        bench("before: get + draw 1, cache miss",
+              lambda: (deck_cache.invalidate(deck.id),
+                       Deck.get(deck.id).draw()))
+        bench("after: get + draw 1, cache hit",
+              lambda: Deck.get(deck.id).draw())
+
+
+if __name__ == '__main__':
+    getting()
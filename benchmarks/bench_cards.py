@@ -0,0 +1,123 @@
+"""
+Compare the interned, slot-based Card against the original dict-backed Card.
+
+    python benchmarks/bench_cards.py
+"""
+from __future__ import print_function
+
+import random
+import sys
+
+from common import bench, header
+
+from deck.encoders import decode_card
+from deck.models import Card, Deck, DECK_LAYOUT
+
+
+class LegacyCard(object):
+    """The dict-backed Card and its comparisons, as they were before cards
+    were interned and given precomputed sort keys"""
+
+    SUITS = Card.SUITS
+    RANKS = Card.RANKS
+
+    def __init__(self, rank, suit):
+        try:
+            self.rank = rank
+            self.suit = suit
+            self.code = (self.SUITS[suit], self.RANKS[rank])
+        except KeyError:
+            raise Exception("Invalid Card.")
+
+    def __eq__(self, other):
+        suit, rank = self.code
+        try:
+            other_rank = self.RANKS[other]
+            return rank == other_rank
+        except KeyError:
+            try:
+                other_suit, other_rank = other.code
+                return suit == other_suit and rank == other_rank
+            except AttributeError:
+                raise Exception
+
+    def _calculate_rank(self, other):
+        _, rank = self.code
+        try:
+            other_rank = LegacyCard.RANKS[other]
+        except KeyError:
+            try:
+                _, other_rank = other.code
+            except AttributeError:
+                raise Exception
+        return rank, other_rank
+
+    def __lt__(self, other):
+        rank, other_rank = self._calculate_rank(other)
+        return rank < other_rank
+
+    def __gt__(self, other):
+        return (not self < other) and (not self == other)
+
+
+def legacy_deck(n):
+    cards = []
+    for card in DECK_LAYOUT:
+        for i in range(0, n):
+            cards.append(LegacyCard(card.rank, card.suit))
+    return cards
+
+
+def memory():
+    header("Memory per card (bytes)")
+    legacy = LegacyCard("Ace", "Spades")
+    legacy_size = sys.getsizeof(legacy) + sys.getsizeof(legacy.__dict__)
+    print("{:<48} {:>12}".format("legacy Card (object + __dict__)",
+                                 legacy_size))
+    print("{:<48} {:>12}".format("interned Card (slots)",
+                                 sys.getsizeof(Card("Ace", "Spades"))))
+
+    header("Memory for a count=100 deck (bytes, excluding the list)")
+    print("{:<48} {:>12}".format("legacy: 5200 distinct cards",
+                                 5200 * legacy_size))
+    print("{:<48} {:>12}".format("interned: 52 shared cards",
+                                 52 * sys.getsizeof(Card("Ace", "Spades"))))
+
+
+def throughput():
+    header("Throughput")
+    encoded = [{'rank': card.rank, 'suit': card.suit} for card in DECK_LAYOUT]
+
+    bench("legacy: construct 52 cards",
+          lambda: [LegacyCard(c['rank'], c['suit']) for c in encoded])
+    bench("interned: look up 52 cards",
+          lambda: [Card(c['rank'], c['suit']) for c in encoded])
+    bench("interned: decode_card x 52",
+          lambda: [decode_card(c) for c in encoded])
+    bench("legacy: build a count=100 deck", lambda: legacy_deck(100))
+    bench("interned: Deck(100, shuffle=False)",
+          lambda: Deck(100, shuffle=False))
+
+
+def sorting():
+    header("Sorting shoes")
+    for n in (10, 100):
+        legacy = legacy_deck(n)
+        deck = Deck(n)
+        cards = deck.cards
+        random.shuffle(legacy)
+
+        bench("n={}: sorted(legacy cards)".format(n), lambda: sorted(legacy))
+        bench("n={}: sorted(cards)".format(n), lambda: sorted(cards))
+        bench("n={}: sorted(cards, key=sort_key)".format(n),
+              lambda: sorted(cards, key=lambda card: card.sort_key))
+        bench("n={}: Deck.sorted_by('rank')".format(n),
+              lambda: deck.sorted_by("rank"))
+        bench("n={}: Deck.sort('rank')".format(n),
+              lambda: deck.sort("rank"))
+
+
+if __name__ == '__main__':
+    memory()
+    throughput()
+    sorting()
@@ -0,0 +1,80 @@
+"""
+Drawing from one deck from many threads at once: throughput of optimistic
+versioning with retries against locking the row with SELECT ... FOR UPDATE.
+
+    python benchmarks/bench_concurrency.py
+
+SQLite's in-memory database cannot be shared between threads, so this uses
+a temporary database file. SQLite ignores SELECT ... FOR UPDATE and locks
+the whole database on writes, so run it against the production database to
+see how the two modes compare there.
+"""
+from __future__ import print_function
+
+import os
+import tempfile
+import threading
+import time
+
+from common import header
+
+from django.db import connection
+
+from deck.exceptions import NotEnoughCardsException
+from deck.models import Deck, DeckModel
+
+
+def setup_file_database():
+    path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+    connection.settings_dict['TEST'] = {'NAME': path}
+
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def deal(deck_id, threads, lock):
+    """Draw every card from threads at once
+
+    Returns:
+        int: The number of cards dealt
+    """
+    dealt = []
+
+    def player():
+        try:
+            while True:
+                try:
+                    dealt.append(Deck.modify(deck_id, lambda deck: deck.draw(),
+                                             lock=lock, retries=1000))
+                except NotEnoughCardsException:
+                    return
+        finally:
+            connection.close()
+
+    players = [threading.Thread(target=player) for _ in range(threads)]
+    for thread in players:
+        thread.start()
+    for thread in players:
+        thread.join()
+
+    return len(dealt)
+
+
+def contention():
+    setup_file_database()
+
+    for lock in (False, True):
+        header("select_for_update" if lock else "optimistic versioning")
+
+        for threads in (1, 2, 4, 8):
+            deck = DeckModel.create_deck(n=4)
+            start = time.time()
+            dealt = deal(deck.id, threads, lock)
+            elapsed = time.time() - start
+            print("  {} threads: {:>8.0f} draws/s".format(
+                threads, dealt / elapsed))
+
+
+if __name__ == '__main__':
+    contention()
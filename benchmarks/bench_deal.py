@@ -0,0 +1,41 @@
+"""
+Dealing from many decks for tournament seeding: shuffling a Deck and
+drawing each hand in Python, against shuffling a 2-D array of decks and
+dealing hands as views with deck.batch. Requires NumPy.
+
+    python benchmarks/bench_deal.py
+"""
+from __future__ import print_function
+
+from common import bench, header
+
+from deck import batch
+from deck.models import Deck
+
+
+def deck_deal(decks, hands, size):
+    """Deal as before, one Deck and one draw per hand"""
+    dealt = []
+    for _ in range(decks):
+        deck = Deck(shuffle=True)
+        dealt.append([deck.draw(size) for _ in range(hands)])
+    return dealt
+
+
+def deals():
+    for decks in (1000, 10000, 50000):
+        header("{} decks, 8 hands of 2 cards".format(decks))
+
+        if decks <= 10000:
+            bench("before: Deck(shuffle=True) + draw",
+                  lambda: deck_deal(decks, 8, 2), number=1, repeat=1)
+        bench("after: batch.deal",
+              lambda: batch.deal(decks, hands=8, size=2), number=1, repeat=3)
+        bench("after: batch.deal + to_cards of one hand",
+              lambda: batch.to_cards(batch.deal(decks, hands=8,
+                                                size=2)[1][0, 0]),
+              number=1, repeat=3)
+
+
+if __name__ == '__main__':
+    deals()
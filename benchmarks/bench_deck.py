@@ -0,0 +1,102 @@
+"""
+Benchmarks for the in-memory Deck.
+
+    python benchmarks/bench_deck.py
+"""
+from __future__ import print_function
+
+import random
+import sys
+
+from common import bench, header
+
+from deck.encoders import encode_deck
+from deck import models
+from deck.models import Card, Deck, DECK_LAYOUT
+
+
+SHOES = (1, 8, 100)
+
+
+def copying_draw(cards, n):
+    """Draw n cards the way Deck.draw did before, by copying the whole deck"""
+    drawn = []
+    pool = cards[:]
+
+    while n > 0:
+        drawn.append(pool.pop())
+        n -= 1
+
+    return drawn, pool
+
+
+def card_by_card(n):
+    """Build and shuffle a shoe the way Deck.__init__ did, one Card at a time"""
+    cards = []
+    for card in DECK_LAYOUT:
+        for i in range(0, n):
+            cards.append(Card(card.rank, card.suit))
+    random.shuffle(cards)
+    return cards
+
+
+def storage():
+    header("Card storage for Deck(n) (bytes)")
+    for n in SHOES:
+        deck = Deck(n)
+        print("{:<48} {:>12}".format("n={}: list of Cards".format(n),
+                                     sys.getsizeof(deck.cards)))
+        print("{:<48} {:>12}".format("n={}: array of ordinals".format(n),
+                                     sys.getsizeof(deck.ordinals)))
+
+
+def operations():
+    header("Deck operations on the ordinal buffer")
+    for n in SHOES:
+        deck = Deck(n)
+        cards = deck.cards
+        queen = Card("Queen", "Spades")
+
+        bench("n={}: shuffle a list of Cards".format(n),
+              lambda: random.shuffle(cards))
+        bench("n={}: Deck.shuffle".format(n), deck.shuffle)
+        bench("n={}: search a list of Cards".format(n),
+              lambda: next(i for i, c in enumerate(cards) if c == queen))
+        bench("n={}: Deck.find, card".format(n), lambda: deck.find(queen))
+        bench("n={}: Deck.find, rank".format(n), lambda: deck.find("Ace"))
+        bench("n={}: encode_deck".format(n), lambda: encode_deck(deck))
+
+
+def draw_latency():
+    header("Draw latency as the shoe grows")
+    for n in SHOES + (1000,):
+        template = Deck(n).ordinals
+        decks = [Deck(ordinals=template)]
+        cards = decks[0].cards
+
+        def draw_one():
+            # refilling the deck costs O(n) once every 52 * n draws
+            if not decks[0].has_cards():
+                decks[0] = Deck(ordinals=template)
+            decks[0].draw()
+
+        bench("n={}: copy and pop one card".format(n),
+              lambda: copying_draw(cards, 1))
+        bench("n={}: Deck.draw()".format(n), draw_one)
+
+
+def construction():
+    header("Shoe construction, NumPy {}".format(
+        "installed" if models.numpy is not None else "not installed"))
+    for n in (1, 8, 100, 1000):
+        bench("n={}: card by card".format(n), lambda: card_by_card(n))
+        bench("n={}: Deck(n, shuffle=False)".format(n),
+              lambda: Deck(n, shuffle=False))
+        bench("n={}: Deck(n)".format(n), lambda: Deck(n))
+
+
+if __name__ == '__main__':
+    construction()
+    storage()
+    operations()
+    draw_latency()
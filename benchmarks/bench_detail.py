@@ -0,0 +1,48 @@
+"""
+Polling one deck: decoding it through Deck.get against answering from its
+count and pile columns.
+
+    python benchmarks/bench_detail.py
+"""
+from __future__ import print_function
+
+from common import bench, header, setup_database
+
+from deck.encoders import dumps_deck_model
+from deck.models import Deck, DeckModel, deck_cache
+
+
+def polling():
+    setup_database()
+    fields = ('id', 'count', 'pile')
+
+    for n in (1, 8, 100):
+        header("n={}".format(n))
+        deck = DeckModel.create_deck(n=n)
+        deck.discard(deck.draw(10))
+        deck.save()
+
+        def decoded():
+            deck_cache.clear()
+            return Deck.get(deck.id).dumps(fields=fields)
+
+        def from_columns():
+            deck_model = DeckModel.get_many(
+                [deck.deck_model.id],
+                fields=('id', 'count', 'pile_directory', 'pile_data'))
+            return dumps_deck_model(deck_model[deck.deck_model.id],
+                                    fields=fields)
+
+        def counts():
+            deck_model = DeckModel.get_many(
+                [deck.deck_model.id], fields=('id', 'count', 'pile_directory'))
+            return dumps_deck_model(deck_model[deck.deck_model.id],
+                                    fields=('id', 'count', 'pile_counts'))
+
+        bench("before: Deck.get + dumps", decoded)
+        bench("after: detail from columns", from_columns)
+        bench("after: counts from columns", counts)
+
+
+if __name__ == '__main__':
+    polling()
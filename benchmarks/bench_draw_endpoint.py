@@ -0,0 +1,61 @@
+"""
+Cost of one draw request for count = 1, 10, 100 and 1000: validating the
+drawn cards with HandSerializer and rendering them with JSONRenderer,
+against writing them from precomputed payloads.
+
+    python benchmarks/bench_draw_endpoint.py
+"""
+from __future__ import print_function
+
+from common import bench, header, setup_database
+
+from django.core.urlresolvers import reverse
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+
+from deck.encoders import encode_card, iter_hand
+from deck.models import CARDS, Deck, DeckModel
+from deck.serializers import HandSerializer
+
+COUNTS = (1, 10, 100, 1000)
+REQUESTS = 20
+
+
+def serialized_hand(ordinals):
+    """Encode drawn cards as the draw endpoint did before"""
+    hand = HandSerializer(data={'cards': [encode_card(CARDS[ordinal])
+                                          for ordinal in ordinals]})
+    hand.is_valid()
+    return JSONRenderer().render(hand.validated_data)
+
+
+def encoding():
+    header("encoding the drawn cards")
+
+    for count in COUNTS:
+        ordinals = Deck(n=20).ordinals[-count:]
+        bench("before: count={} serializer".format(count),
+              lambda: serialized_hand(ordinals))
+        bench("after: count={} payloads".format(count),
+              lambda: b''.join(iter_hand(ordinals)))
+
+
+def requests():
+    header("PUT deck/<uuid>/draw/?count=...: get, draw, save, respond")
+    client = Client()
+
+    for count in COUNTS:
+        # enough cards for every timed request to draw from
+        n = count * REQUESTS * 3 // 52 + 1
+        url = reverse('api:deck_draw', args=(DeckModel.create_deck(n).id,))
+        url += "?count={}".format(count)
+
+        bench("count={}".format(count),
+              lambda: b''.join(client.put(url).streaming_content),
+              number=REQUESTS, repeat=3)
+
+
+if __name__ == '__main__':
+    setup_database()
+    encoding()
+    requests()
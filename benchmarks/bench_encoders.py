@@ -0,0 +1,49 @@
+"""
+Encoding decks: per-card dicts and json.dumps against precomputed per-card
+JSON fragments.
+
+    python benchmarks/bench_encoders.py
+"""
+from __future__ import print_function
+
+import json
+
+from common import bench, header
+
+from rest_framework.renderers import JSONRenderer
+
+from deck.encoders import dumps_deck, encode_deck, encode_pile
+from deck.models import Deck
+from deck.serializers import DeckModelSerializer
+
+
+def legacy_encode_deck(deck):
+    """Encode a deck the way encode_deck did, building each card's dict"""
+    return {
+        'cards': [{'rank': card.rank, 'suit': card.suit} for card in deck],
+        'pile': encode_pile(deck.pile),
+        'count': deck.count,
+    }
+
+
+def encoding():
+    for n in (1, 8, 100):
+        header("n={}".format(n))
+        deck = Deck(n)
+        deck.discard(deck.draw(10))
+        renderer = JSONRenderer()
+
+        bench("before: json.dumps(legacy encode_deck)",
+              lambda: json.dumps(legacy_encode_deck(deck)))
+        bench("after: json.dumps(encode_deck)",
+              lambda: json.dumps(encode_deck(deck)))
+        bench("after: dumps_deck", lambda: dumps_deck(deck))
+        bench("before: detail response, serializer + renderer",
+              lambda: renderer.render(DeckModelSerializer(
+                  legacy_encode_deck(deck)).data))
+        bench("after: detail response, dumps_deck",
+              lambda: dumps_deck(deck, fields=('id', 'count', 'pile')))
+
+
+if __name__ == '__main__':
+    encoding()
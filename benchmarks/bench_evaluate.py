@@ -0,0 +1,42 @@
+"""
+Evaluating hands: poker scores of five and seven card hands, scoring every
+five card subset of a seven card hand against the lookup tables, and
+blackjack totals, for batches of 10,000 hands.
+
+    python benchmarks/bench_evaluate.py
+"""
+from __future__ import print_function
+
+import itertools
+import random
+
+from common import bench, header
+
+from deck.evaluate import blackjack_totals, evaluate_many, poker_rank
+
+HANDS = 10000
+
+
+def best_of_fives(ordinals):
+    """Score a hand by scoring each of its five card subsets"""
+    return max(poker_rank(five) for five in itertools.combinations(ordinals, 5))
+
+
+def hands():
+    rng = random.Random(0)
+
+    for size in (2, 5, 7):
+        header("{} hands of {} cards".format(HANDS, size))
+        batch = [rng.sample(range(52), size) for _ in range(HANDS)]
+
+        if size >= 5:
+            bench("poker_rank", lambda: evaluate_many(batch), repeat=3)
+        if size == 7:
+            bench("best of 21 five card subsets",
+                  lambda: evaluate_many(batch, best_of_fives), repeat=1)
+        bench("blackjack_totals",
+              lambda: evaluate_many(batch, blackjack_totals), repeat=3)
+
+
+if __name__ == '__main__':
+    hands()
@@ -0,0 +1,41 @@
+"""
+Polling many decks: one GET to /api/deck/<uuid> per deck against one GET
+to /api/decks?ids=...
+
+    python benchmarks/bench_list.py
+"""
+from __future__ import print_function
+
+from common import bench, header, setup_database
+
+from django.core.urlresolvers import reverse
+from django.test import Client
+
+from deck.models import DeckModel, deck_cache
+
+
+def polling():
+    setup_database()
+    client = Client()
+
+    for n in (10, 100, 500):
+        header("decks={}".format(n))
+        ids = [deck.id for deck in DeckModel.create_decks(n, n=8)]
+
+        def separate():
+            deck_cache.clear()
+            for id in ids:
+                client.get(reverse('api:deck_detail', args=(id,)))
+
+        def listed():
+            response = client.get(reverse('api:deck_list') +
+                                  '?ids=' + ','.join(ids))
+            b''.join(response.streaming_content)
+
+        bench("before: {} detail GETs".format(n), separate, number=1,
+              repeat=3)
+        bench("after: 1 list GET", listed, number=1, repeat=3)
+
+
+if __name__ == '__main__':
+    polling()
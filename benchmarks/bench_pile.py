@@ -0,0 +1,75 @@
+"""
+Piles of 10,000 cards and more: lists of Card objects against arrays of
+card ordinals, for pushing, drawing, counting, copying and packing.
+
+    python benchmarks/bench_pile.py
+"""
+from __future__ import print_function
+
+import copy
+
+from common import bench, header
+
+from deck.encoders import pack_pile
+from deck.models import Card, Deck, Pile
+
+
+class ListPile(object):
+    """Piles as lists of Cards, as Pile kept them before"""
+
+    def __init__(self):
+        self.piles = {Pile.DEFAULT_PILE: []}
+
+    def push(self, cards, into = Pile.DEFAULT_PILE):
+        if not all(isinstance(card, Card) for card in cards):
+            raise Exception("There is a non-card in this pile")
+        self.piles.setdefault(into, []).extend(cards)
+
+    def draw(self, n = 1, from_pile = Pile.DEFAULT_PILE):
+        pile = self.piles[from_pile]
+        cards = pile[len(pile) - n:]
+        del pile[len(pile) - n:]
+        return cards[::-1]
+
+    def count(self, pile = Pile.DEFAULT_PILE):
+        return len(self.piles[pile])
+
+    @property
+    def ordinals(self):
+        return dict((name, [card.ordinal for card in cards])
+                    for name, cards in self.piles.items())
+
+    def __copy__(self):
+        pile = ListPile()
+        pile.piles = dict((name, cards[:])
+                          for name, cards in self.piles.items())
+        return pile
+
+
+def full_pile(pile_class, cards):
+    pile = pile_class()
+    pile.push(cards)
+    return pile
+
+
+def piles():
+    for n in (200, 1000):
+        cards = Deck(n=n).cards
+        header("{} cards".format(len(cards)))
+
+        for label, pile_class in (("before", ListPile), ("after", Pile)):
+            pile = full_pile(pile_class, cards)
+
+            bench("{}: push all".format(label),
+                  lambda: full_pile(pile_class, cards))
+            bench("{}: push 1 + draw 1".format(label),
+                  lambda: (pile.push([cards[0]]), pile.draw()))
+            bench("{}: count".format(label), pile.count)
+            bench("{}: copy".format(label), lambda: copy.copy(pile))
+            bench("{}: pack".format(label), lambda: pack_pile(pile))
+            bench("{}: draw all".format(label),
+                  lambda: full_pile(pile_class, cards).draw(len(cards)))
+
+
+if __name__ == '__main__':
+    piles()
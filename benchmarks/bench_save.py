@@ -0,0 +1,88 @@
+"""
+Saving decks: write amplification per operation, rewriting every column
+against writing only the changed ones.
+
+    python benchmarks/bench_save.py
+"""
+from __future__ import print_function
+
+import json
+
+from common import bench, header, setup_database
+
+from deck.encoders import pack_ordinals, pack_pile
+from deck.models import Card, Deck, DeckModel
+
+COLUMNS = ('card_data', 'count', 'pile_directory', 'pile_data',
+           'permutations')
+
+
+def column_size(deck_model, column):
+    value = getattr(deck_model, column)
+    if column in ('card_data', 'pile_data'):
+        return len(value)
+    return len(json.dumps(value))
+
+
+def bytes_written(deck, operation):
+    """Apply operation to a stored deck and save it
+
+    Returns:
+        tuple: The bytes written by the save, and the bytes in the whole row
+    """
+    deck = Deck.get(deck.id)
+    operation(deck)
+    written = []
+    save = deck.deck_model.save
+
+    def recording_save(update_fields=None, **kwargs):
+        written.extend(update_fields or COLUMNS)
+        save(update_fields=update_fields, **kwargs)
+
+    deck.deck_model.save = recording_save
+    deck.save()
+    return (sum(column_size(deck.deck_model, c) for c in written),
+            sum(column_size(deck.deck_model, c) for c in COLUMNS))
+
+
+def full_save(deck):
+    """Save every column, as saving did before deltas"""
+    deck_model = deck.deck_model
+    deck_model.card_data = pack_ordinals(deck.ordinals)
+    deck_model.count = deck.count
+    deck_model.pile_directory, deck_model.pile_data = pack_pile(deck.pile)
+    deck_model.permutations = deck.permutations
+    deck_model.save()
+
+
+OPERATIONS = [
+    ("draw 1", lambda deck: deck.draw()),
+    ("discard 1", lambda deck: deck.discard(Card(2, "Clubs"))),
+    ("riffle", lambda deck: deck.riffle()),
+    ("shuffle", lambda deck: deck.shuffle()),
+]
+
+
+def write_amplification():
+    setup_database()
+
+    for n in (1, 8, 100):
+        header("n={}".format(n))
+        deck = DeckModel.create_deck(n=n)
+
+        for label, operation in OPERATIONS:
+            written, row = bytes_written(deck, operation)
+            print("  {:<12} {:>8} of {:>8} bytes written ({:.1f}%)".format(
+                label, written, row, 100.0 * written / row))
+
+        for label, save in (("before: draw 1 + save every column",
+                             full_save),
+                            ("after: draw 1 + save changed columns",
+                             Deck.save)):
+            stored = Deck.get(DeckModel.create_deck(n=n).id)
+            bench(label, lambda: (stored.draw(), save(stored)),
+                  number=stored.count, repeat=1)
+
+
+if __name__ == '__main__':
+    write_amplification()
@@ -0,0 +1,39 @@
+"""
+Cost of one shuffle request -- load, shuffle and save -- for each kind of
+shuffle, on a large shoe.
+
+    python benchmarks/bench_shuffle_endpoint.py
+"""
+from __future__ import print_function
+
+from common import bench, header, setup_database
+
+from deck.models import Deck, DeckModel
+
+
+SHUFFLES = (
+    ("full shuffle", lambda deck: deck.shuffle()),
+    ("shuffle the top 10 cards", lambda deck: deck.shuffle(top=10)),
+    ("cut", lambda deck: deck.cut()),
+    ("riffle, 3 passes", lambda deck: deck.riffle(passes=3)),
+)
+
+
+def shuffle_requests():
+    for n in (8, 100):
+        header("n={} ({} cards): Deck.get, shuffle, Deck.save".format(
+            n, 52 * n))
+        deck_id = DeckModel.create_deck(n).id
+
+        for label, shuffle in SHUFFLES:
+            def request():
+                deck = Deck.get(deck_id)
+                shuffle(deck)
+                deck.save()
+
+            bench(label, request)
+
+
+if __name__ == '__main__':
+    setup_database()
+    shuffle_requests()
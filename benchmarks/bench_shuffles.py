@@ -0,0 +1,29 @@
+"""
+Shuffle throughput for each of the Deck's shuffling strategies.
+
+    python benchmarks/bench_shuffles.py
+"""
+from __future__ import print_function
+
+from common import bench, header
+
+from deck.models import Deck
+from deck.shuffles import SHUFFLERS, numpy
+
+
+def throughput():
+    for name in sorted(SHUFFLERS):
+        if name == "numpy" and numpy is None:
+            print("\nSkipping the numpy shuffler: NumPy is not installed")
+            continue
+
+        header("{} shuffler".format(name))
+        for n in (1, 8, 100, 1000):
+            deck = Deck(n, shuffle=False, shuffler=name)
+            seconds = bench("n={}: Deck.shuffle".format(n), deck.shuffle)
+            print("{:<48} {:>12.0f}".format("n={}: cards per second".format(n),
+                                            deck.count / seconds))
+
+
+if __name__ == '__main__':
+    throughput()
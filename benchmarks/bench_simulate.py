@@ -0,0 +1,66 @@
+"""
+Monte Carlo deals: building a shuffled Deck and drawing Cards for every
+trial, against deck.simulate's batches of ordinals, and how deck.simulate
+scales with worker processes.
+
+    python benchmarks/bench_simulate.py
+
+Scaling stops at the number of CPUs; run it on a machine with several to
+see deals per second grow with the workers.
+"""
+from __future__ import print_function
+
+import multiprocessing
+import time
+
+from common import header
+
+from deck import evaluate, simulate
+from deck.models import Deck
+
+TRIALS = 100000
+
+
+def poker_category(ordinals):
+    return evaluate.category(evaluate.poker_rank(ordinals))
+
+
+def deck_trials(trials, n, deal):
+    """Estimate the odds as before, one Deck and one draw per trial"""
+    counts = {}
+    for _ in range(trials):
+        cards = Deck(n=n, shuffle=True).draw(deal)
+        outcome = poker_category([card.ordinal for card in cards])
+        counts[outcome] = counts.get(outcome, 0) + 1
+    return counts
+
+
+def report(label, trials, run):
+    start = time.time()
+    run()
+    print("  {:<36} {:>10.0f} deals/s".format(
+        label, trials / (time.time() - start)))
+
+
+def deals():
+    cpus = multiprocessing.cpu_count()
+
+    for n in (1, 8):
+        header("n={}, 7 cards per deal, {} CPUs".format(n, cpus))
+
+        report("before: Deck(n, shuffle=True).draw", TRIALS // 20,
+               lambda: deck_trials(TRIALS // 20, n, 7))
+        report("after: 0 workers", TRIALS,
+               lambda: simulate.run(poker_category, TRIALS, n=n, deal=7,
+                                    workers=0, seed=1))
+
+        workers = 1
+        while workers <= max(cpus, 2):
+            report("after: {} workers".format(workers), TRIALS,
+                   lambda: simulate.run(poker_category, TRIALS, n=n, deal=7,
+                                        workers=workers, seed=1))
+            workers *= 2
+
+
+if __name__ == '__main__':
+    deals()
@@ -0,0 +1,80 @@
+"""
+Storing decks: JSON lists of card dicts against one byte per card ordinal
+and a pile directory, and decoding stored decks eagerly against lazily.
+
+    python benchmarks/bench_storage.py
+"""
+from __future__ import print_function
+
+import json
+
+from common import bench, header, setup_database
+
+from deck.encoders import decode_deck, encode_ordinals, encode_pile, \
+                          pack_ordinals, pack_pile, unpack_ordinals, \
+                          unpack_pile
+from deck.models import Deck, DeckModel
+
+
+def storage():
+    for n in (1, 8, 100):
+        header("n={}".format(n))
+        deck = Deck(n)
+        deck.discard(deck.draw(10))
+
+        cards_json = json.dumps(encode_ordinals(deck.ordinals))
+        pile_json = json.dumps(encode_pile(deck.pile))
+        card_data = pack_ordinals(deck.ordinals)
+        directory, pile_data = pack_pile(deck.pile)
+        directory_json = json.dumps(directory)
+
+        before = len(cards_json) + len(pile_json)
+        after = len(card_data) + len(pile_data) + len(directory_json)
+        print("  row size: {} bytes before, {} bytes after ({:.1f}x)".format(
+            before, after, float(before) / after))
+
+        bench("before: json.dumps(cards, pile)",
+              lambda: (json.dumps(encode_ordinals(deck.ordinals)),
+                       json.dumps(encode_pile(deck.pile))))
+        bench("after: pack_ordinals + pack_pile",
+              lambda: (pack_ordinals(deck.ordinals), pack_pile(deck.pile)))
+        bench("before: json.loads + decode_deck",
+              lambda: decode_deck({'cards': json.loads(cards_json),
+                                   'pile': json.loads(pile_json)}))
+        bench("after: unpack_ordinals + unpack_pile",
+              lambda: Deck(ordinals=unpack_ordinals(card_data),
+                           pile=unpack_pile(json.loads(directory_json),
+                                            pile_data)))
+
+
+def eager_decode(deck_model):
+    """Decode a stored deck, unpacking its cards and piles up front"""
+    return Deck(ordinals=unpack_ordinals(deck_model.card_data),
+                pile=deck_model.decode_pile(),
+                permutations=deck_model.permutations)
+
+
+def decoding():
+    setup_database()
+
+    for n in (1, 8, 100):
+        header("decoding, n={}".format(n))
+        deck = DeckModel.create_deck(n=n)
+        deck.discard(deck.draw(10))
+        deck.save()
+        deck_model = DeckModel.objects.get(pk=deck.id)
+        fields = ('id', 'count', 'pile')
+
+        bench("before: eager decode + detail",
+              lambda: eager_decode(deck_model).dumps(fields=fields))
+        bench("after: lazy decode + detail",
+              lambda: deck_model.decode().dumps(fields=fields))
+        bench("before: eager decode + riffle",
+              lambda: eager_decode(deck_model).riffle())
+        bench("after: lazy decode + riffle",
+              lambda: deck_model.decode().riffle())
+
+
+if __name__ == '__main__':
+    storage()
+    decoding()
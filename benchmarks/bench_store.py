@@ -0,0 +1,46 @@
+"""
+Deck stores: reading and saving decks through the database against through
+a shared Django cache, with and without write-behind. The in-process deck
+cache is cleared before every read, as it would be in another worker.
+
+    python benchmarks/bench_store.py
+"""
+from __future__ import print_function
+
+from common import bench, header, setup_database
+
+from deck import models
+from deck.models import CacheDeckStore, DatabaseDeckStore, Deck, DeckModel, \
+                        deck_cache
+
+
+def get(id):
+    deck_cache.clear()
+    return Deck.get(id)
+
+
+def draw(id):
+    deck_cache.clear()
+    return Deck.modify(id, lambda deck: deck.draw())
+
+
+def stores():
+    setup_database()
+
+    for label, store in (
+            ("database", DatabaseDeckStore()),
+            ("cache, write-through", CacheDeckStore(cache='decks')),
+            ("cache, write-behind 5s", CacheDeckStore(cache='decks',
+                                                      write_behind=5))):
+        models.deck_store = store
+        header(label)
+
+        for n in (1, 8):
+            deck = DeckModel.create_deck(n=n)
+            bench("n={}: get".format(n), lambda: get(deck.id))
+            bench("n={}: get + draw 1 + save".format(n),
+                  lambda: draw(deck.id), number=n * 52, repeat=1)
+
+
+if __name__ == '__main__':
+    stores()
@@ -0,0 +1,100 @@
+"""
+Responses for large decks: peak memory per request when the whole JSON
+response is built before it is written, against streaming it in chunks.
+
+    python benchmarks/bench_streaming.py
+
+Each response is built in a forked child process, and the growth of the
+child's peak resident set size while it writes the response out is
+reported. Linux only.
+"""
+from __future__ import print_function
+
+import os
+import resource
+
+from common import bench, header
+
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import JSONStreamingResponse
+from api.views import draw_cards
+from deck.encoders import dumps_deck, dumps_deck_model, encode_hand, \
+                          iter_deck, iter_deck_model, iter_hand
+from deck.models import Deck, DeckModel
+
+PAGE_KB = os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def current_rss_kb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * PAGE_KB
+
+
+def peak_growth_kb(respond):
+    """Build a response in a child process and write it to /dev/null
+
+    Returns:
+        int: How far the child's peak resident set size rose above its
+        resident set size before the response was built, in KB
+    """
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(read_end)
+        start = current_rss_kb()
+        with open(os.devnull, 'wb') as devnull:
+            for chunk in respond():
+                devnull.write(chunk)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.write(write_end, str(max(peak - start, 0)).encode('ascii'))
+        os._exit(0)
+
+    os.close(write_end)
+    growth = int(os.read(read_end, 64))
+    os.close(read_end)
+    os.waitpid(pid, 0)
+    return growth
+
+
+def buffered(content):
+    """Write a response as HttpResponse does, from one string"""
+    return iter([HttpResponse(content).content])
+
+
+def streamed(chunks):
+    return JSONStreamingResponse(chunks).streaming_content
+
+
+def memory():
+    for n in (100, 1000):
+        deck = Deck(n=n)
+        deck.discard(deck.draw(deck.count // 2))
+        deck_model = DeckModel.encode(deck)
+        header("{} cards, {} in the pile".format(52 * n, deck.pile.count()))
+
+        fields = ('id', 'count', 'cards')
+        cases = [
+            ("detail", lambda: buffered(dumps_deck_model(deck_model)),
+             lambda: streamed(iter_deck_model(deck_model))),
+            ("cards", lambda: buffered(dumps_deck(deck, fields=fields)),
+             lambda: streamed(iter_deck(deck, fields=fields))),
+            ("draw all", lambda: buffered(JSONRenderer().render(
+                encode_hand(draw_cards(deck, deck.count)))),
+             lambda: streamed(iter_hand(draw_cards(deck, deck.count)))),
+        ]
+
+        for label, before, after in cases:
+            print("  {:<10} {:>8} KB before, {:>8} KB after".format(
+                label, peak_growth_kb(before), peak_growth_kb(after)))
+
+        bench("before: cards", lambda: list(buffered(
+            dumps_deck(deck, fields=fields))), repeat=3)
+        bench("after: cards", lambda: list(streamed(
+            iter_deck(deck, fields=fields))), repeat=3)
+
+
+if __name__ == '__main__':
+    memory()
@@ -0,0 +1,69 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+Each benchmark is a standalone script, run from the repository root:
+
+    python benchmarks/bench_cards.py
+
+Importing this module puts the Django project on the path and configures
+Django, so the scripts can import the deck app directly.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'cards')
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cards.settings.local")
+
+import django
+django.setup()
+
+
+def bench(label, func, number=None, repeat=5):
+    """Time func and print the best per-call time
+
+    Args:
+        label (str): A description of what is being timed
+        func (callable): A callable taking no arguments
+
+    Keyword Args:
+        number (int or None): Calls per timing run. Chosen automatically so
+        that each run takes at least 0.2 seconds when None.
+
+        repeat (int): Number of timing runs; the best one is reported
+
+    Returns:
+        float: The best time per call, in seconds
+    """
+    timer = timeit.Timer(func)
+
+    if number is None:
+        number = 1
+        while timer.timeit(number) < 0.2:
+            number *= 2
+
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    print("{:<48} {:>12.2f} us".format(label, best * 1e6))
+    return best
+
+
+def header(title):
+    print()
+    print(title)
+    print("=" * len(title))
+
+
+def setup_database():
+    """Create an in-memory test database for benchmarks which save decks"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
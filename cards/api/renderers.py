@@ -0,0 +1,31 @@
+from django.http import StreamingHttpResponse
+
+from rest_framework.renderers import JSONRenderer
+
+from deck.encoders import JSONBytes
+
+
+class DeckJSONRenderer(JSONRenderer):
+    """Render JSON, passing already encoded JSONBytes through untouched
+
+    Views return the output of :func:`deck.encoders.dumps_deck` and friends in
+    a Response, and it is written out without being parsed or re-encoded.
+    """
+
+    def render(self, data, accepted_media_type = None, renderer_context = None):
+        if isinstance(data, JSONBytes):
+            return bytes(data)
+        return super(DeckJSONRenderer, self).render(
+            data, accepted_media_type, renderer_context)
+
+
+class JSONStreamingResponse(StreamingHttpResponse):
+    """Stream JSON which is encoded in chunks as the response is written
+
+    Views pass the output of :func:`deck.encoders.iter_deck` and friends, so
+    a large Deck or hand is never held in memory as one encoded string.
+    """
+
+    def __init__(self, chunks, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super(JSONStreamingResponse, self).__init__(chunks, **kwargs)
@@ -1,12 +1,26 @@
 import json
+import uuid
 
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.http import QueryDict
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.renderers import JSONRenderer
 
 from .views import DeckCreateAPIView
 
-from deck.models import DeckModel, Deck, Card
+from deck.encoders import encode_card
+from deck.models import CARDS, DeckModel, Deck, Card
+from deck.serializers import HandSerializer
+
+
+def read(response):
+    """The content of a response, joining streamed responses' chunks"""
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
 
 
 class TestDeckCreateAPIView(TestCase):
@@ -62,6 +76,55 @@ class TestDeckCreateAPIView(TestCase):
 
         self.assertEqual(response.status_code, 409)
 
+    def test_post_with_seed(self):
+        client = Client()
+
+        # decks created with the same seed are shuffled the same way
+        url = reverse('api:deck_create') + '?seed=42&count=2'
+        decks = [Deck.get(json.loads(client.post(url).content).get('id'))
+                 for i in range(2)]
+        self.assertEqual(decks[0].cards, decks[1].cards)
+
+        url = reverse('api:deck_create') + '?seed=foobar'
+        response = client.post(url)
+        self.assertEqual(response.status_code, 409)
+
+
+class TestDeckBulkCreateAPIView(TestCase):
+
+    def test_post(self):
+        client = Client()
+        url = reverse('api:deck_bulk_create') + '?decks=3&count=2&seed=7'
+        response = client.post(url)
+
+        self.assertEqual(response.status_code, 201)
+
+        created = json.loads(response.content)
+        self.assertEqual(created.get('count'), 104)
+        self.assertEqual(len(set(created.get('ids'))), 3)
+
+        decks = [Deck.get(id) for id in created.get('ids')]
+        self.assertEqual([deck.count for deck in decks], [104] * 3)
+        self.assertNotEqual(decks[0].cards, decks[1].cards)
+
+        # seeded decks are reproducible
+        ids = json.loads(client.post(url).content).get('ids')
+        self.assertEqual(Deck.get(ids[2]).cards, decks[2].cards)
+
+        # the count is that of the created decks
+        url = reverse('api:deck_bulk_create') + '?decks=2&count=-1'
+        created = json.loads(client.post(url).content)
+        self.assertEqual(created.get('count'), 0)
+
+    def test_post_with_bad_params(self):
+        client = Client()
+
+        for params in ('', '?decks=0', '?decks=foobar', '?decks=100001',
+                       '?decks=2&shuffle=42', '?decks=10000&count=2',
+                       '?decks=2&count=10000'):
+            response = client.post(reverse('api:deck_bulk_create') + params)
+            self.assertEqual(response.status_code, 409)
+
 class TestDeckDetailAPIView(TestCase):
 
     def setUp(self):
@@ -74,9 +137,134 @@ class TestDeckDetailAPIView(TestCase):
 
         self.assertEqual(response.status_code, 200)
 
-        deck = json.loads(response.content)
+        deck = json.loads(read(response))
         self.assertTrue(isinstance(deck, dict))
         self.assertEqual(deck.get('count'), 52)
+        self.assertEqual(deck.get('id'), self.id)
+        self.assertEqual(deck.get('pile'), {'discard': []})
+
+    def test_get_from_columns(self):
+        self.deck.discard(self.deck.draw(n=3), into="mine")
+        self.deck.save()
+        client = Client()
+
+        # the detail and the counts never read the cards
+        for name in ('deck_detail', 'deck_counts'):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(reverse('api:' + name, args=(self.id,)))
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(queries.captured_queries), 1)
+            self.assertNotIn('card_data', queries.captured_queries[0]['sql'])
+
+            deck = json.loads(read(response))
+            self.assertEqual(deck.get('count'), 49)
+
+        self.assertEqual(deck.get('pile_counts'), {'discard': 0, 'mine': 3})
+
+        url = reverse('api:deck_counts',
+                      args=('00000000-0000-0000-0000-000000000000',))
+        self.assertEqual(client.get(url).status_code, 404)
+
+
+class TestDeckCards(TestCase):
+
+    def test_get(self):
+        deck = DeckModel.create_deck(n=2)
+        deck.draw(4)
+        deck.shuffle()
+        deck.save()
+        client = Client()
+
+        response = client.get(reverse('api:deck_cards', args=(deck.id,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        cards = json.loads(read(response))
+        self.assertEqual(cards.get('id'), deck.id)
+        self.assertEqual(cards.get('count'), 100)
+        self.assertEqual([Card(**card).ordinal for card in cards.get('cards')],
+                         list(Deck.get(deck.id).ordinals))
+
+        url = reverse('api:deck_cards',
+                      args=('00000000-0000-0000-0000-000000000000',))
+        self.assertEqual(client.get(url).status_code, 404)
+
+
+class TestDeckPileEvaluate(TestCase):
+
+    def test_get(self):
+        deck = DeckModel.create_deck()
+        deck.discard([Card("Ace", "Hearts"), Card("King", "Hearts")],
+                     into="seat 1")
+        deck.save()
+        client = Client()
+
+        url = reverse('api:deck_pile_evaluate', args=(deck.id, "seat 1"))
+        with self.assertNumQueries(1):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        evaluation = json.loads(response.content)
+        self.assertEqual(evaluation.get('pile'), "seat 1")
+        self.assertEqual(evaluation.get('count'), 2)
+        self.assertEqual(evaluation.get('category'), "high card")
+        self.assertEqual((evaluation.get('hard'), evaluation.get('soft')),
+                         (11, 21))
+
+        for args in ((deck.id, "nothing"),
+                     ('00000000-0000-0000-0000-000000000000', "seat 1")):
+            url = reverse('api:deck_pile_evaluate', args=args)
+            self.assertEqual(client.get(url).status_code, 404)
+
+
+class TestDeckList(TestCase):
+
+    def setUp(self):
+        self.decks = [DeckModel.create_deck(n=n) for n in (1, 2, 3)]
+        self.decks[1].discard(self.decks[1].draw(n=2), into="mine")
+        self.decks[1].save()
+        self.ids = [deck.id for deck in self.decks]
+
+    def test_get(self):
+        missing = '00000000-0000-0000-0000-000000000000'
+        ids = [self.ids[2], missing, self.ids[0], self.ids[1], self.ids[0]]
+        url = reverse('api:deck_list') + '?ids=' + ','.join(ids)
+
+        with self.assertNumQueries(1):
+            response = Client().get(url)
+            content = b''.join(response.streaming_content)
+
+        self.assertEqual(response.status_code, 200)
+
+        decks = json.loads(content)
+        self.assertEqual([deck.get('id') for deck in decks],
+                         [self.ids[2], self.ids[0], self.ids[1]])
+        self.assertEqual([deck.get('count') for deck in decks],
+                         [156, 52, 102])
+        self.assertEqual(len(decks[2].get('pile').get('mine')), 2)
+        self.assertEqual(set(decks[0]), set(['id', 'count', 'pile']))
+
+    def test_get_with_bad_ids(self):
+        client = Client()
+
+        for params in ('', '?ids=', '?ids=foobar',
+                       '?ids=' + ','.join([self.ids[0]] * 2 + ['42'])):
+            response = client.get(reverse('api:deck_list') + params)
+            self.assertEqual(response.status_code, 409)
+
+    def test_get_max_ids(self):
+        client = Client()
+        ids = [str(uuid.uuid4()) for _ in range(1000)]
+
+        response = client.get(reverse('api:deck_list') + '?ids=' +
+                              ','.join(ids[:999]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(read(response)), [])
+
+        response = client.get(reverse('api:deck_list') + '?ids=' +
+                              ','.join(ids))
+        self.assertEqual(response.status_code, 409)
 
 
 class TestDeckDraw(TestCase):
@@ -96,7 +284,7 @@ class TestDeckDraw(TestCase):
         url = "{}{}".format(reverse('api:deck_draw', args=(self.id,)),
                             "?count=7")
         response = client.put(url)
-        decoded_response = json.loads(response.content)
+        decoded_response = json.loads(read(response))
 
         for card in decoded_response.get('cards'):
             self.assertTrue(isinstance(card, dict))
@@ -109,6 +297,19 @@ class TestDeckDraw(TestCase):
         self.assertEqual(response.status_code, 409)
 
 
+    def test_put_matches_hand_serializer(self):
+        top = list(reversed(Deck.get(self.id).ordinals[-10:]))
+        url = reverse('api:deck_draw', args=(self.id,)) + "?count=10"
+        response = Client().put(url)
+
+        # the drawn cards are written as HandSerializer validated them
+        hand = HandSerializer(data={'cards': [
+            encode_card(CARDS[ordinal]) for ordinal in top]})
+        self.assertTrue(hand.is_valid())
+        self.assertEqual(read(response),
+                         JSONRenderer().render(hand.validated_data))
+
+
 class TestDeckShuffle(TestCase):
 
     def setUp(self):
@@ -122,6 +323,42 @@ class TestDeckShuffle(TestCase):
 
         self.assertEqual(response.status_code, 200)
 
+    def test_put_with_seed(self):
+        client = Client()
+        deck = DeckModel.create_deck(shuffle=False)
+        url = reverse('api:deck_shuffle', args=(deck.id,)) + '?seed=7'
+        response = client.put(url)
+
+        self.assertEqual(response.status_code, 200)
+
+        # the same seed shuffles the same cards into the same order
+        expected = Deck(shuffle=False, seed=7)
+        expected.shuffle()
+        self.assertEqual(Deck.get(deck.id).cards, expected.cards)
+
+        url = reverse('api:deck_shuffle', args=(self.id,)) + '?seed=x'
+        response = client.put(url)
+        self.assertEqual(response.status_code, 409)
+
+    def test_put_with_method(self):
+        client = Client()
+        url = reverse('api:deck_shuffle', args=(self.id,))
+
+        for params in ['?method=cut', '?method=cut&at=10', '?method=riffle',
+                       '?method=riffle&passes=7&seed=1', '?top=10']:
+            response = client.put(url + params)
+            self.assertEqual(response.status_code, 200)
+
+        deck = Deck.get(self.id)
+        self.assertEqual(len(deck.permutations), 5)
+        self.assertEqual(sorted(deck.ordinals), sorted(Deck().ordinals))
+
+        for params in ['?method=juggle', '?method=cut&at=53', '?top=53',
+                       '?method=riffle&passes=0', '?method=riffle&passes=21',
+                       '?method=riffle&passes=x']:
+            response = client.put(url + params)
+            self.assertEqual(response.status_code, 409)
+
 class TestDeckDelete(TestCase):
 
     def setUp(self):
@@ -190,3 +427,72 @@ class TestDiscardHand(TestCase):
 
         for card in decoded_cards:
             self.assertIn(card, deck.pile.piles['my pile'])
+
+
+class TestDeckBatch(TestCase):
+
+    def setUp(self):
+        self.deck = DeckModel.create_deck(shuffle=False)
+        self.id = self.deck.id
+        self.url = reverse('api:deck_batch', args=(self.id,))
+
+    def post(self, operations):
+        return Client().post(self.url, data=json.dumps(operations),
+                             content_type='application/json')
+
+    def test_post(self):
+        operations = [{'op': "draw", 'count': 2},
+                      {'op': "discard", 'into': "mine",
+                       'cards': [{'rank': "Queen", 'suit': "Spades"}]},
+                      {'op': "shuffle", 'method': "riffle", 'seed': 42},
+                      {'op': "draw"}]
+        response = self.post(operations)
+
+        self.assertEqual(response.status_code, 200)
+
+        batch = json.loads(response.content)
+        results = batch.get('results')
+        self.assertEqual(batch.get('count'), 49)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0].get('cards'),
+                         [{'rank': "Queen", 'suit': "Spades"},
+                          {'rank': "King", 'suit': "Spades"}])
+        self.assertEqual(results[1:3], [{}, {}])
+        self.assertEqual(len(results[3].get('cards')), 1)
+
+        # the operations were applied in order, and saved
+        expected = Deck(shuffle=False)
+        expected.draw(n=2)
+        expected.riffle(seed=42)
+        expected.draw()
+        deck = Deck.get(self.id)
+        self.assertEqual(deck.cards, expected.cards)
+        self.assertEqual(deck.pile.piles['mine'], [Card("Queen", "Spades")])
+
+    def test_post_with_bad_operations(self):
+        for operations in ([], {'op': "draw"}, [{'op': "deal"}],
+                           [{'op': "draw", 'count': "two"}],
+                           [{'op': "shuffle", 'method': "overhand"}],
+                           [{'op': "draw"}, {'op': "draw", 'count': 52}],
+                           [{'op': "discard", 'into': 5, 'cards': [
+                               {'rank': 2, 'suit': "Clubs"}]}],
+                           [{'op': "discard", 'into': True, 'cards': [
+                               {'rank': 2, 'suit': "Clubs"}]}]):
+            response = self.post(operations)
+            self.assertEqual(response.status_code, 409)
+
+        # nothing is saved when an operation fails
+        self.assertEqual(Deck.get(self.id).count, 52)
+        self.assertIn("Operation 1", self.post(
+            [{'op': "draw"}, {'op': "discard"}]).content)
+
+        # a null count draws one card
+        response = self.post([{'op': "draw", 'count': None}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content).get('count'), 51)
+
+        url = reverse('api:deck_batch',
+                      args=('00000000-0000-0000-0000-000000000000',))
+        response = Client().post(url, data='[{"op": "draw"}]',
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 404)
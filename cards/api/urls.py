@@ -3,13 +3,25 @@ import re
 from django.conf.urls import patterns, include, url
 
 from .views import DeckCreateAPIView, DeckDetailAPIView, DeckDrawAPIView, \
-                   DeckShuffleAPIView, DeckDeleteAPIView, DeckDiscardAPIView
+                   DeckShuffleAPIView, DeckDeleteAPIView, DeckDiscardAPIView, \
+                   DeckBulkCreateAPIView, DeckBatchAPIView, DeckListAPIView, \
+                   DeckCountsAPIView, DeckCardsAPIView, \
+                   DeckPileEvaluateAPIView
 
 
 urlpatterns = patterns('',
+    url(r'^decks/?$', DeckListAPIView.as_view(), name='deck_list'),
     url(r'^deck/new/?$', DeckCreateAPIView.as_view(), name='deck_create'),
+    url(r'^deck/new/bulk/?$', DeckBulkCreateAPIView.as_view(),
+          name='deck_bulk_create'),
     url(r'^deck/(?P<uuid>[0-9a-f\-]{36})/?$',
           DeckDetailAPIView.as_view(), name='deck_detail'),
+    url(r'^deck/(?P<uuid>[0-9a-f\-]{36})/cards/?$',
+          DeckCardsAPIView.as_view(), name='deck_cards'),
+    url(r'^deck/(?P<uuid>[0-9a-f\-]{36})/counts/?$',
+          DeckCountsAPIView.as_view(), name='deck_counts'),
+    url(r'^deck/(?P<uuid>[0-9a-f\-]{36})/pile/(?P<name>[^/]+)/evaluate/?$',
+          DeckPileEvaluateAPIView.as_view(), name='deck_pile_evaluate'),
     url(r'^deck/(?P<uuid>[0-9a-f\-]{36})/draw/?$',
           DeckDrawAPIView.as_view(), name='deck_draw'),
     url(r'^deck/(?P<uuid>[0-9a-f\-]{36})/shuffle/?$',
@@ -18,4 +30,6 @@ urlpatterns = patterns('',
           DeckDeleteAPIView.as_view(), name='deck_delete'),
     url(r'^deck/(?P<uuid>[0-9a-f\-]{36})/discard/?$',
           DeckDiscardAPIView.as_view(), name='deck_discard'),
+    url(r'^deck/(?P<uuid>[0-9a-f\-]{36})/batch/?$',
+          DeckBatchAPIView.as_view(), name='deck_batch'),
 )
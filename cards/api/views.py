@@ -1,16 +1,131 @@
+import collections
+import uuid
+
+from django.conf import settings
 from django.http import Http404
 
 from rest_framework import status
-from rest_framework.renderers import JSONRenderer
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .exceptions import BadRequestException
+from .renderers import DeckJSONRenderer, JSONStreamingResponse
 
-from deck.encoders import encode_card, decode_card
+from deck.encoders import decode_card, dumps_deck_model, encode_hand, \
+                          iter_deck, iter_deck_model, iter_hand, \
+                          unpack_pile_ordinals
+from deck.evaluate import evaluate
 from deck.models import Deck, DeckModel, NotEnoughCardsException
-from deck.serializers import DeckModelSerializer, HandSerializer
-from deck.exceptions import NoSuchDeckException
+from deck.serializers import DeckModelSerializer
+from deck.exceptions import ConcurrentModificationException, \
+                           NoSuchDeckException
+
+
+def to_int(value, param):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise BadRequestException(
+            detail="{} must be of type Int".format(param.capitalize()))
+
+
+def get_int(request, param):
+    return to_int(request.query_params.get(param), param)
+
+
+def get_seed(request):
+    return get_int(request, 'seed')
+
+
+def get_deck_options(request):
+    """Read the count, shuffle and seed params for creating Decks
+
+    Returns:
+        dict: Keyword arguments for DeckModel.create_deck
+    """
+    try:
+        count = int(request.query_params.get('count', 1))
+    except ValueError:
+        raise BadRequestException(detail="Count Must be of type Int")
+
+    shuffle_flag = request.query_params.get('shuffle', "true").lower()
+
+    if shuffle_flag == "true":
+        shuffle = True
+    elif shuffle_flag == "false":
+        shuffle = False
+    else:
+        raise BadRequestException(detail="Shuffle must be True or False.")
+
+    return {'n': count, 'shuffle': shuffle, 'seed': get_seed(request)}
+
+
+SHUFFLE_METHODS = ("full", "cut", "riffle")
+
+
+def get_shuffle_method(method):
+    method = (method or "full").lower()
+
+    if method not in SHUFFLE_METHODS:
+        raise BadRequestException(
+            detail="Method must be one of {}.".format(
+                ", ".join(SHUFFLE_METHODS)))
+    return method
+
+
+def draw_cards(deck, count = 1):
+    """Draw count cards from the Deck
+
+    Returns:
+        array: The drawn card ordinals, from the top of the Deck down. See
+        :func:`deck.encoders.encode_hand` and
+        :func:`deck.encoders.iter_hand` for encoding them.
+    """
+    try:
+        return deck.draw_ordinals(count)
+    except NotEnoughCardsException:
+        raise BadRequestException
+
+
+def shuffle_deck(deck, method = "full", seed = None, at = None,
+                 passes = None, top = None):
+    method = get_shuffle_method(method)
+
+    try:
+        if method == "cut":
+            deck.cut(at=at, seed=seed)
+        elif method == "riffle":
+            deck.riffle(passes=1 if passes is None else passes, seed=seed)
+        else:
+            deck.shuffle(seed=seed, top=top)
+    except Exception as e:
+        raise BadRequestException(detail=str(e))
+
+
+def discard_cards(deck, cards, into = None):
+    if not cards:
+        raise BadRequestException(detail="You must PUT data.")
+
+    try:
+        decoded_cards = [decode_card(card) for card in cards]
+    except:
+        format_example = '[ {"rank": 2 ,"suit": "Diamonds"}, ... ]'
+        message = ("Cannot decode cards. "
+                   "The card format is:\n{}".format(format_example))
+        raise BadRequestException(detail=message)
+
+    if into is not None and not isinstance(into, basestring):
+        raise BadRequestException(detail="Into must be a string.")
+
+    try:
+        deck.discard(decoded_cards, into=into)
+    except:
+        message = ("Invalid pile name. Make sure into param is a"
+                   " hashable type")
+        raise BadRequestException(detail=message)
 
 
 class GetDeckMixIn(object):
@@ -21,66 +136,181 @@ class GetDeckMixIn(object):
         except NoSuchDeckException:
             raise Http404
 
+    def get_deck_model(self, id, fields):
+        """Read some of a Deck's columns, without decoding the Deck"""
+        try:
+            id = uuid.UUID(id)
+        except ValueError:
+            raise Http404
+
+        deck_model = DeckModel.get_many([id], fields=fields).get(id)
+        if deck_model is None:
+            raise Http404
+        return deck_model
+
+    def modify_deck(self, uuid, operation):
+        """Apply operation to the Deck and save it. See Deck.modify."""
+        try:
+            return Deck.modify(uuid, operation,
+                               lock=settings.DECK_SELECT_FOR_UPDATE)
+        except NoSuchDeckException:
+            raise Http404
+        except ConcurrentModificationException as e:
+            raise BadRequestException(detail=str(e))
+
 
 class DeckCreateAPIView(APIView):
 
+    renderer_classes = (DeckJSONRenderer, BrowsableAPIRenderer)
+
     def post(self, request, format = None):
-        try:
-            count = int(request.query_params.get('count', 1))
-        except ValueError:
-            raise BadRequestException(detail="Count Must be of type Int")
+        deck = DeckModel.create_deck(**get_deck_options(request))
+        return Response(deck.dumps(fields=DeckModelSerializer.Meta.fields),
+                        status=status.HTTP_201_CREATED)
 
-        shuffle_flag = request.query_params.get('shuffle', "true").lower()
 
-        if shuffle_flag == "true":
-            shuffle = True
-        elif shuffle_flag == "false":
-            shuffle = False
-        else:
-            raise BadRequestException(detail="Shuffle must be True or False.")
+class DeckBulkCreateAPIView(APIView):
 
-        deck = DeckModel.create_deck(n=count, shuffle=shuffle)
-        serialized_deck = DeckModelSerializer(deck.encode())
-        return Response(serialized_deck.data, status=status.HTTP_201_CREATED)
+    MAX_DECKS = 10000
+    # The most cards in all of the created Decks together
+    MAX_CARDS = 52 * MAX_DECKS
+
+    def post(self, request, format = None):
+        decks = get_int(request, 'decks')
+
+        if decks is None or not 1 <= decks <= self.MAX_DECKS:
+            raise BadRequestException(
+                detail="Decks must be between 1 and {}.".format(
+                    self.MAX_DECKS))
+
+        options = get_deck_options(request)
+        if decks * 52 * options['n'] > self.MAX_CARDS:
+            raise BadRequestException(
+                detail="You may create at most {} cards at once.".format(
+                    self.MAX_CARDS))
+
+        created = DeckModel.create_decks(decks, **options)
+        return Response({'count': created[0].count,
+                         'ids': [deck.id for deck in created]},
+                        status=status.HTTP_201_CREATED)
 
 
 class DeckDetailAPIView(GetDeckMixIn, APIView):
+    """Get a Deck's id, count and piles from its columns, without reading
+    or decoding its cards. The response is streamed."""
+
+    FIELDS = ('id', 'count', 'pile_directory', 'pile_data')
+
+    def get(self, request, uuid, format = None):
+        deck_model = self.get_deck_model(uuid, self.FIELDS)
+        return JSONStreamingResponse(iter_deck_model(
+            deck_model, fields=DeckModelSerializer.Meta.fields))
+
+
+class DeckCardsAPIView(GetDeckMixIn, APIView):
+    """Get a Deck's id, count and remaining cards, from the bottom of the
+    Deck to the top. The response is streamed."""
 
     def get(self, request, uuid, format = None):
         deck = self.get_deck(uuid)
-        serialized_deck = DeckModelSerializer(deck.encode())
-        return Response(serialized_deck.data)
+        return JSONStreamingResponse(iter_deck(
+            deck, fields=('id', 'count', 'cards')))
+
+
+class DeckCountsAPIView(GetDeckMixIn, APIView):
+    """Get a Deck's id, count and the number of cards in each pile, from
+    the count and pile directory columns alone"""
+
+    renderer_classes = (DeckJSONRenderer, BrowsableAPIRenderer)
+
+    FIELDS = ('id', 'count', 'pile_directory')
+
+    def get(self, request, uuid, format = None):
+        deck_model = self.get_deck_model(uuid, self.FIELDS)
+        return Response(dumps_deck_model(
+            deck_model, fields=('id', 'count', 'pile_counts')))
+
+
+class DeckPileEvaluateAPIView(GetDeckMixIn, APIView):
+    """Evaluate a pile as a hand: its poker score and category, and its
+    blackjack totals. See :func:`deck.evaluate.evaluate`. Only the pile
+    columns are read."""
+
+    FIELDS = ('id', 'pile_directory', 'pile_data')
+
+    def get(self, request, uuid, name, format = None):
+        deck_model = self.get_deck_model(uuid, self.FIELDS)
+        piles = unpack_pile_ordinals(deck_model.pile_directory,
+                                     deck_model.pile_data)
+
+        if name not in piles:
+            raise Http404
+
+        evaluation = evaluate(piles[name])
+        evaluation.update({'id': str(deck_model.id), 'pile': name})
+        return Response(evaluation)
+
+
+class DeckListAPIView(APIView):
+    """Get the id, count and piles of many Decks in one request
+
+    The ids are passed comma separated, as ?ids=<uuid>,<uuid>,... Decks
+    which do not exist are left out. The Decks are read in one query,
+    their cards are never decoded, and the response is streamed.
+    """
+
+    # SQLite allows at most 999 parameters in a query
+    MAX_IDS = 999
+    FIELDS = ('id', 'count', 'pile_directory', 'pile_data')
+
+    def get(self, request, format = None):
+        try:
+            ids = [uuid.UUID(id) for id in
+                   request.query_params.get('ids', '').split(',') if id]
+        except ValueError:
+            raise BadRequestException(detail="Ids must be UUIDs.")
+
+        ids = list(collections.OrderedDict.fromkeys(ids))
+        if not 1 <= len(ids) <= self.MAX_IDS:
+            raise BadRequestException(
+                detail="Ids must list between 1 and {} decks.".format(
+                    self.MAX_IDS))
+
+        deck_models = DeckModel.get_many(ids, fields=self.FIELDS)
+        renderer = JSONRenderer()
+
+        def stream():
+            yield b'['
+            separator = b''
+            for id in ids:
+                if id in deck_models:
+                    yield separator + renderer.render(
+                        DeckModelSerializer(deck_models[id]).data)
+                    separator = b','
+            yield b']'
+
+        return JSONStreamingResponse(stream())
 
 
 class DeckDrawAPIView(GetDeckMixIn, APIView):
+    """Draw cards from a Deck. The drawn cards are streamed."""
 
     def put(self, request, uuid, format = None):
-        deck = self.get_deck(uuid)
         count = int(request.query_params.get('count', 1))
-
-        try:
-            if count == 1:
-                cards = [encode_card(deck.draw())]
-            else:
-                cards = [encode_card(card) for card in deck.draw(count)]
-        except NotEnoughCardsException:
-            raise BadRequestException
-
-        deck.save()
-        serialized_hand = HandSerializer(data={"cards": cards})
-
-        if serialized_hand.is_valid():
-            return Response(serialized_hand.validated_data)
-        else:
-            raise Exception("Something Went Wrong")
+        ordinals = self.modify_deck(uuid, lambda deck: draw_cards(deck, count))
+        return JSONStreamingResponse(iter_hand(ordinals))
 
 
 class DeckShuffleAPIView(GetDeckMixIn, APIView):
 
     def put(self, request, uuid, format = None):
-        deck = self.get_deck(uuid)
-        deck.shuffle()
-        deck.save()
+        seed = get_seed(request)
+        method = get_shuffle_method(request.query_params.get('method'))
+        at, passes, top = [get_int(request, param)
+                           for param in ('at', 'passes', 'top')]
+
+        self.modify_deck(uuid, lambda deck: shuffle_deck(
+            deck, method, seed=seed, at=at, passes=passes, top=top))
         return Response()
 
 
@@ -95,25 +325,73 @@ class DeckDeleteAPIView(GetDeckMixIn, APIView):
 class DeckDiscardAPIView(GetDeckMixIn, APIView):
 
     def put(self, request, uuid, format = None):
-        deck = self.get_deck(uuid)
         cards = request.data
+        into = request.query_params.get('into')
 
-        if not cards:
-            raise BadRequestException(detail="You must PUT data.")
-        else:
-            try:
-                decoded_cards = [decode_card(card) for card in cards]
-            except:
-                format_example = '[ {"rank": 2 ,"suit": "Diamonds"}, ... ]'
-                message = ("Cannot decode cards. "
-                           "The card format is:\n{}".format(format_example))
-                raise BadRequestException(detail=message)
-            into = request.query_params.get('into')
-            try:
-                deck.discard(decoded_cards, into=into)
-            except:
-                message = ("Invalid pile name. Make sure into param is a"
-                           " hashable type")
-                raise BadRequestException(detail=message)
-            deck.save()
+        self.modify_deck(uuid, lambda deck: discard_cards(deck, cards, into))
         return Response()
+
+
+class DeckBatchAPIView(GetDeckMixIn, APIView):
+    """Apply a list of operations to a Deck, and save it once
+
+    The operations are applied in order. Each is a dict with an "op" of
+    "draw", "discard" or "shuffle", and the same parameters as the draw,
+    discard and shuffle endpoints:
+
+        [{"op": "draw", "count": 2},
+         {"op": "discard", "cards": [{"rank": 2, "suit": "Clubs"}],
+          "into": "mine"},
+         {"op": "shuffle", "method": "riffle"}]
+
+    The response has a result for each operation, which for draws is the
+    drawn cards. If any operation fails, none of them are saved.
+    """
+
+    MAX_OPERATIONS = 100
+
+    def post(self, request, uuid, format = None):
+        operations = request.data
+
+        if not isinstance(operations, list) or not operations:
+            raise BadRequestException(
+                detail="You must POST a list of operations.")
+        if len(operations) > self.MAX_OPERATIONS:
+            raise BadRequestException(
+                detail="You may POST at most {} operations.".format(
+                    self.MAX_OPERATIONS))
+
+        def apply_all(deck):
+            results = []
+            for i, operation in enumerate(operations):
+                try:
+                    results.append(self.apply(deck, operation))
+                except BadRequestException as e:
+                    raise BadRequestException(
+                        detail="Operation {}: {}".format(i, e.detail))
+            return {'count': deck.count, 'results': results}
+
+        return Response(self.modify_deck(uuid, apply_all))
+
+    def apply(self, deck, operation):
+        if not isinstance(operation, dict):
+            raise BadRequestException(detail="Operations must be objects.")
+
+        op = operation.get('op')
+
+        if op == "draw":
+            count = to_int(operation.get('count'), 'count')
+            if count is None:
+                count = 1
+            return encode_hand(draw_cards(deck, count))
+        elif op == "discard":
+            discard_cards(deck, operation.get('cards'),
+                          into=operation.get('into'))
+        elif op == "shuffle":
+            shuffle_deck(deck, operation.get('method'),
+                         **dict((param, to_int(operation.get(param), param))
+                                for param in ('seed', 'at', 'passes', 'top')))
+        else:
+            raise BadRequestException(
+                detail="Op must be one of draw, discard, shuffle.")
+        return {}
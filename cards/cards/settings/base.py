@@ -96,6 +96,52 @@ FIXTURE_DIRS = (
     os.path.join(SITE_ROOT, 'fixtures'),
 )
 
+# Lock a deck's row with SELECT ... FOR UPDATE while a request modifies it.
+# Otherwise concurrent modifications are detected by the deck's version and
+# retried.
+DECK_SELECT_FOR_UPDATE = False
+
+# Caches
+# https://docs.djangoproject.com/en/1.8/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'decks': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'decks',
+    },
+}
+
+# Where saved decks live. DatabaseDeckStore keeps them in the database.
+# To share hot decks between worker processes, use
+# 'deck.models.CacheDeckStore' with a cache they share (memcached, Redis or
+# the filesystem), and OPTIONS such as:
+#
+#     {'CACHE': 'decks', 'TIMEOUT': 3600, 'WRITE_BEHIND': 5}
+#
+# WRITE_BEHIND only writes a deck's row to the database when the deck is
+# saved that many seconds after its row was last written, instead of on
+# every save. A deck which is then left alone is only written by
+# `manage.py flush_decks`, so run `manage.py flush_decks --interval 5`
+# alongside the workers. It needs memcached or Redis.
+DECK_STORE = {
+    'BACKEND': 'deck.models.DatabaseDeckStore',
+}
+
+# Each process caches decoded decks. The least recently used are evicted
+# once there are more than MAX_DECKS of them or MAX_CARDS cards in them, and
+# every deck is evicted TIMEOUT seconds after it was cached. A cached deck
+# is only used while its version matches the deck store's, which costs a
+# one-column query, so decks saved or deleted by other processes are not
+# served from the cache.
+DECK_CACHE = {
+    'MAX_DECKS': 1024,
+    'MAX_CARDS': 1024 * 52,
+    'TIMEOUT': 60,
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.7/topics/i18n/
 
@@ -32,5 +32,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(DJANGO_ROOT, 'db.sqlite3'),
+        # SQLite's in-memory test database cannot be shared between threads
+        # on Python 2, so the tests use a file, which the threaded tests in
+        # deck.test_models need
+        'TEST': {
+            'NAME': os.path.join(DJANGO_ROOT, 'test_db.sqlite3'),
+        },
     }
 }
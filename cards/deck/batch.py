@@ -0,0 +1,138 @@
+"""
+.. module:: deck.batch
+   :synopsis: Shuffle and deal from many decks at once with NumPy.
+
+A batch of decks is a 2-D ``uint8`` array of card ordinals with one deck
+per row, from the bottom of the deck to the top, just as
+:attr:`deck.models.Deck.ordinals` holds a single deck. Every row is
+shuffled at once by sorting a matrix of random keys, and hands are dealt as
+views of the top of each row, so dealing copies no cards.
+
+    >>> from deck import batch
+    >>> decks, hands = batch.deal(10000, hands=8, size=2, seed=1)
+    >>> hands.shape
+    (10000, 8, 2)
+    >>> batch.to_cards(hands[0, 3])
+
+Rows and hands become Decks and Cards only when asked for, with
+:func:`to_deck` and :func:`to_cards`. Requires NumPy.
+
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .models import CARDS, Deck, lay_out
+from .shuffles import random_orders
+
+
+def _require_numpy():
+    if numpy is None:
+        raise Exception("deck.batch requires NumPy.")
+
+
+def new(decks, n = 1):
+    """Lay out a batch of fresh, unshuffled shoes
+
+    Args:
+        decks (int): The number of shoes
+
+    Keyword Args:
+        n (int): The number of 52 card decks in each shoe
+
+    Returns:
+        numpy.ndarray: A (decks, 52 * n) array of card ordinals
+    """
+    _require_numpy()
+    shoe = numpy.frombuffer(lay_out(n), dtype=numpy.uint8)
+    return numpy.tile(shoe, (decks, 1))
+
+
+def shuffle(decks, seed = None):
+    """Shuffle every row of a batch of decks in place
+
+    Args:
+        decks (numpy.ndarray): A 2-D array of card ordinals
+
+    Keyword Args:
+        seed (int or None): Seed the shuffle, so that it can be reproduced
+
+    Returns:
+        numpy.ndarray: decks
+    """
+    _require_numpy()
+    rng = numpy.random.RandomState(seed)
+    start = 0
+
+    for order in random_orders(rng, len(decks), decks.shape[1]):
+        rows = decks[start:start + len(order)]
+        rows[:] = rows[numpy.arange(len(rows))[:, None], order]
+        start += len(order)
+
+    return decks
+
+
+def deal(decks, hands = 1, size = 5, n = 1, seed = None):
+    """Shuffle a batch of decks and deal hands from the top of each
+
+    Args:
+        decks (int or numpy.ndarray): The number of fresh shoes to lay out,
+        or a 2-D array of card ordinals, which is shuffled in place
+
+    Keyword Args:
+        hands (int): The number of hands to deal from each deck
+
+        size (int): The number of cards in each hand
+
+        n (int): The number of 52 card decks in each fresh shoe
+
+        seed (int or None): Seed the shuffle, so that it can be reproduced
+
+    Returns:
+        tuple: The shuffled decks, and the hands, a (decks, hands, size)
+        view of the top hands * size cards of each deck. Each hand's cards
+        are listed from the top of the deck down, and the first hand is
+        dealt from the very top.
+
+    Raises:
+        Exception if the decks hold fewer than hands * size cards
+    """
+    if not hasattr(decks, 'shape'):
+        decks = new(decks, n=n)
+
+    dealt = hands * size
+    if dealt > decks.shape[1]:
+        raise Exception("You're trying to deal more cards than are in the"
+                        " decks!")
+
+    shuffle(decks, seed=seed)
+    top = decks[:, ::-1][:, :dealt]
+    return decks, top.reshape(len(decks), hands, size)
+
+
+def to_cards(hand):
+    """
+    Returns:
+        Card list: The canonical Cards of a row or hand of card ordinals
+    """
+    return list(map(CARDS.__getitem__, hand.tolist()))
+
+
+def to_deck(row, dealt = 0):
+    """Build a Deck from a row of a batch
+
+    Args:
+        row (numpy.ndarray): A deck's card ordinals, from the bottom to the
+        top
+
+    Keyword Args:
+        dealt (int): The number of cards dealt from the top of the row,
+        which are left out of the Deck
+
+    Returns:
+        Deck: The Deck. The row's bytes are copied once, and are unpacked
+        the first time the Deck's cards are used.
+    """
+    return Deck(card_data=row[:len(row) - dealt].tobytes())
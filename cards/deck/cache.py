@@ -0,0 +1,134 @@
+"""
+deck.cache
+==========
+
+An in-process cache of decoded Decks, so that a Deck which is used many
+times a second during a game is not read from the database and decoded
+every time.
+
+The cache holds its own copies of the Decks put in it and hands out copies,
+so a Deck taken from the cache can be changed without changing the cache.
+:class:`deck.models.Deck` reads through the cache and writes through it
+when it saves or deletes a Deck.
+"""
+import collections
+import copy
+import threading
+import time
+import uuid
+
+
+class DeckCache(object):
+    """A bounded LRU cache of Decks, keyed by id
+
+    Decks are evicted, least recently used first, once the cache holds more
+    than max_decks Decks or more than max_cards cards in them, and timeout
+    seconds after they were put in the cache.
+
+    Attributes:
+        hits (int): The number of gets which found a Deck
+
+        misses (int): The number of gets which did not
+    """
+
+    def __init__(self, max_decks = 1024, max_cards = 1024 * 52,
+                 timeout = 60, clock = time.time):
+        """Initialize a DeckCache
+
+        Keyword Args:
+            max_decks (int): The most Decks to cache. 0 disables the cache.
+
+            max_cards (int): The most cards, in total, in the cached Decks
+
+            timeout (float or None): How many seconds a Deck stays in the
+            cache. None keeps Decks until they are evicted.
+
+            clock (callable): Returns the current time in seconds
+        """
+        self.max_decks = max_decks
+        self.max_cards = max_cards
+        self.timeout = timeout
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._decks = collections.OrderedDict()
+        self._cards = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(id):
+        try:
+            return uuid.UUID(str(id))
+        except ValueError:
+            return str(id)
+
+    def get(self, id):
+        """Get a copy of the cached Deck with an id
+
+        Returns:
+            Deck or None: None if the Deck is not cached or has expired
+        """
+        key = self._key(id)
+
+        with self._lock:
+            entry = self._decks.pop(key, None)
+
+            if entry is not None and self.timeout is not None and \
+                    entry[2] + self.timeout <= self.clock():
+                self._cards -= entry[1]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._decks[key] = entry
+            self.hits += 1
+
+        return copy.copy(entry[0])
+
+    def put(self, deck):
+        """Cache a copy of a saved Deck, replacing any cached Deck with its
+        id, and evict Decks if the cache is full"""
+        if not self.max_decks:
+            return
+
+        key = self._key(deck.id)
+        entry = (copy.copy(deck), deck.count, self.clock())
+
+        with self._lock:
+            previous = self._decks.pop(key, None)
+            if previous is not None:
+                self._cards -= previous[1]
+
+            self._decks[key] = entry
+            self._cards += entry[1]
+
+            while self._decks and (len(self._decks) > self.max_decks or
+                                   self._cards > self.max_cards):
+                self._cards -= self._decks.popitem(last=False)[1][1]
+
+    def invalidate(self, id):
+        """Remove the Deck with an id from the cache, if it is cached"""
+        with self._lock:
+            entry = self._decks.pop(self._key(id), None)
+            if entry is not None:
+                self._cards -= entry[1]
+
+    def clear(self):
+        """Remove every Deck from the cache and reset the counters"""
+        with self._lock:
+            self._decks.clear()
+            self._cards = 0
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._decks)
+
+    @property
+    def cards(self):
+        """
+        Returns:
+            int: The total number of cards in the cached Decks
+        """
+        return self._cards
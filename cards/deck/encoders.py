@@ -1,16 +1,312 @@
+import collections
 import json
 
+from array import array
+
+from django.utils.encoding import force_text
+
 from rest_framework import serializers
 
 import models
 
+from .exceptions import DecodeException
+
+
+class JSONBytes(bytes):
+    """Already encoded JSON, which can be written out as it is"""
+
+
+# Per-card encodings of the 52 canonical cards, indexed by ordinal. These are
+# built on first use, since the cards do not exist until deck.models has been
+# imported, and deck.models imports this module.
+_card_objects = None
+_card_fragments = None
+_hand_objects = None
+_hand_fragments = None
+
+
+def _card_tables():
+    global _card_objects, _card_fragments
+
+    if _card_objects is None:
+        _card_objects = tuple(encode_card(card) for card in models.CARDS)
+        _card_fragments = tuple(
+            json.dumps(card, sort_keys=True, separators=(',', ':'))
+            .encode('utf-8') for card in _card_objects)
+    return _card_objects, _card_fragments
+
+
+def _hand_tables():
+    """Per-card encodings of drawn cards, as HandSerializer validated them:
+    the suit first, then the rank as a string"""
+    global _hand_objects, _hand_fragments
+
+    if _hand_objects is None:
+        _hand_objects = tuple(
+            collections.OrderedDict([('suit', card.suit),
+                                     ('rank', str(card.rank))])
+            for card in models.CARDS)
+        _hand_fragments = tuple(
+            json.dumps(card, separators=(',', ':')).encode('utf-8')
+            for card in _hand_objects)
+    return _hand_objects, _hand_fragments
+
 
 def encode_card(card):
-    card_object = dict(card.__dict__)
+    return {'rank': card.rank, 'suit': card.suit}
+
+
+def encode_ordinals(ordinals):
+    card_objects = _card_tables()[0]
+    return [dict(card_objects[ordinal]) for ordinal in ordinals]
+
+
+def _dumps_name(name):
+    """Encode a pile name as a JSON object key, which must be a string"""
+    return json.dumps(force_text(name)).encode('utf-8')
+
+
+def dumps_ordinals(ordinals):
+    """Encode card ordinals straight to a JSON array
+
+    Args:
+        ordinals (iterable of int): Card ordinals
+
+    Returns:
+        JSONBytes: The cards as a JSON array of {"rank", "suit"} objects
+
+    Each card is written from a JSON fragment encoded once per process, so
+    no per-card dicts are built and nothing goes through json.dumps.
+    """
+    card_fragments = _card_tables()[1]
+    return JSONBytes(b'[' + b','.join([card_fragments[ordinal]
+                                       for ordinal in ordinals]) + b']')
+
+
+def encode_hand(ordinals):
+    """Encode drawn card ordinals as {"cards": [{"suit", "rank"}, ...]}
+
+    The cards are encoded as HandSerializer validated them, from tables
+    built once per process, so the cards the server has just drawn are
+    not validated again.
+    """
+    hand_objects = _hand_tables()[0]
+    return {'cards': [collections.OrderedDict(hand_objects[ordinal])
+                      for ordinal in ordinals]}
+
+
+def dumps_pile(pile):
+    return JSONBytes(b'{' + b','.join(
+        [_dumps_name(name) + b':' + dumps_ordinals(ordinals)
+         for name, ordinals in pile.ordinals.items()]) + b'}')
+
+
+def dumps_deck(deck, fields = ('id', 'count', 'cards', 'pile')):
+    """Encode a Deck straight to JSON
+
+    Args:
+        deck (Deck): The Deck to encode
+
+    Keyword Args:
+        fields (tuple of str): The fields to include, in order. Any of "id",
+        "count", "cards" and "pile". The id is left out of decks which have
+        not been saved.
+
+    Returns:
+        JSONBytes: The encoded Deck
+    """
+    members = []
+
+    for field in fields:
+        if field == 'id' and not deck.deck_model:
+            continue
+        members.append(b'"' + field.encode('utf-8') + b'":' +
+                       _dumps_deck_field(deck, field))
+
+    return JSONBytes(b'{' + b','.join(members) + b'}')
+
+
+def _dumps_deck_field(deck, field):
+    if field == 'id':
+        return json.dumps(str(deck.deck_model.id)).encode('utf-8')
+    elif field == 'count':
+        return str(deck.count).encode('utf-8')
+    elif field == 'cards':
+        return dumps_ordinals(deck.ordinals)
+    elif field == 'pile':
+        return dumps_pile(deck.pile)
+    else:
+        raise Exception("Cannot encode field: {}".format(field))
+
+
+def dumps_packed_pile(directory, data):
+    """Encode a pile directory and data, as stored by DeckModel, straight
+    to JSON without building its Cards"""
+    ordinals = unpack_ordinals(data)
+    members, offset = [], 0
+
+    for name, count in directory:
+        members.append(_dumps_name(name) + b':' +
+                       dumps_ordinals(ordinals[offset:offset + count]))
+        offset += count
+
+    return JSONBytes(b'{' + b','.join(members) + b'}')
+
+
+def dumps_deck_model(deck_model, fields = ('id', 'count', 'pile')):
+    """Encode a DeckModel's columns straight to JSON, without decoding it
+
+    Args:
+        deck_model (DeckModel): The DeckModel to encode
+
+    Keyword Args:
+        fields (tuple of str): The fields to include, in order. Any of "id",
+        "count", "pile" and "pile_counts". Only the columns these are
+        encoded from are used: "pile" is encoded from pile_directory and
+        pile_data, and "pile_counts" from pile_directory alone.
+
+    Returns:
+        JSONBytes: The encoded DeckModel
+    """
+    return JSONBytes(b'{' + b','.join(
+        [b'"' + field.encode('utf-8') + b'":' +
+         _dumps_deck_model_field(deck_model, field)
+         for field in fields]) + b'}')
+
+
+def _dumps_deck_model_field(deck_model, field):
+    if field == 'id':
+        return json.dumps(str(deck_model.id)).encode('utf-8')
+    elif field == 'count':
+        return str(deck_model.count).encode('utf-8')
+    elif field == 'pile':
+        return dumps_packed_pile(deck_model.pile_directory,
+                                 deck_model.pile_data)
+    elif field == 'pile_counts':
+        return json.dumps(deck_model.pile_counts).encode('utf-8')
+    else:
+        raise Exception("Cannot encode field: {}".format(field))
+
+
+# The number of cards encoded into each chunk of a streamed response
+STREAM_CHUNK_SIZE = 1024
+
 
-    if 'code' in card_object.keys():
-        del card_object['code']
-    return card_object
+def _iter_array(items, encode, chunk_size = STREAM_CHUNK_SIZE):
+    """Encode a sequence to a JSON array, chunk_size items at a time
+
+    Args:
+        items (sequence): The items, which must support slicing
+
+        encode (callable): Encodes a slice of items to a list of JSON
+        fragments
+    """
+    yield b'['
+    for start in range(0, len(items), chunk_size):
+        yield (b',' if start else b'') + b','.join(
+            encode(items[start:start + chunk_size]))
+    yield b']'
+
+
+def _iter_object(members):
+    """Encode (name, chunks) pairs to a JSON object, one chunk at a time"""
+    separator = b'{'
+    for name, chunks in members:
+        yield separator + _dumps_name(name) + b':'
+        for chunk in chunks:
+            yield chunk
+        separator = b','
+    yield b'{}' if separator == b'{' else b'}'
+
+
+def iter_ordinals(ordinals, chunk_size = STREAM_CHUNK_SIZE):
+    """Encode card ordinals to a JSON array in chunks, as
+    :func:`dumps_ordinals` does in one piece
+
+    Args:
+        ordinals (sequence of int): Card ordinals, such as an array
+
+    Keyword Args:
+        chunk_size (int): The number of cards in each chunk
+
+    Returns:
+        iterator: The JSON array, as bytes chunks
+    """
+    card_fragments = _card_tables()[1]
+    return _iter_array(
+        ordinals, lambda chunk: [card_fragments[ordinal] for ordinal in chunk],
+        chunk_size)
+
+
+def iter_hand(ordinals, chunk_size = STREAM_CHUNK_SIZE):
+    """Encode drawn card ordinals to a JSON {"cards": [...]} object in
+    chunks, as :func:`encode_hand` encodes them to dicts"""
+    hand_fragments = _hand_tables()[1]
+    return _iter_object([('cards', _iter_array(
+        ordinals, lambda chunk: [hand_fragments[ordinal] for ordinal in chunk],
+        chunk_size))])
+
+
+def iter_pile(pile, chunk_size = STREAM_CHUNK_SIZE):
+    """Encode a Pile to JSON in chunks, as :func:`dumps_pile` does in one
+    piece"""
+    return _iter_object((name, iter_ordinals(ordinals, chunk_size))
+                        for name, ordinals in pile.ordinals.items())
+
+
+def iter_packed_pile(directory, data, chunk_size = STREAM_CHUNK_SIZE):
+    """Encode a pile directory and data to JSON in chunks, as
+    :func:`dumps_packed_pile` does in one piece"""
+    ordinals = unpack_ordinals(data)
+
+    def members():
+        offset = 0
+        for name, count in directory:
+            yield name, iter_ordinals(ordinals[offset:offset + count],
+                                      chunk_size)
+            offset += count
+
+    return _iter_object(members())
+
+
+def iter_deck(deck, fields = ('id', 'count', 'cards', 'pile'),
+              chunk_size = STREAM_CHUNK_SIZE):
+    """Encode a Deck to JSON in chunks, as :func:`dumps_deck` does in one
+    piece
+
+    Returns:
+        iterator: The encoded Deck, as bytes chunks
+    """
+    def members():
+        for field in fields:
+            if field == 'cards':
+                yield field, iter_ordinals(deck.ordinals, chunk_size)
+            elif field == 'pile':
+                yield field, iter_pile(deck.pile, chunk_size)
+            elif field != 'id' or deck.deck_model:
+                yield field, [_dumps_deck_field(deck, field)]
+
+    return _iter_object(members())
+
+
+def iter_deck_model(deck_model, fields = ('id', 'count', 'pile'),
+                    chunk_size = STREAM_CHUNK_SIZE):
+    """Encode a DeckModel's columns to JSON in chunks, as
+    :func:`dumps_deck_model` does in one piece
+
+    Returns:
+        iterator: The encoded DeckModel, as bytes chunks
+    """
+    def members():
+        for field in fields:
+            if field == 'pile':
+                yield field, iter_packed_pile(deck_model.pile_directory,
+                                              deck_model.pile_data,
+                                              chunk_size)
+            else:
+                yield field, [_dumps_deck_model_field(deck_model, field)]
+
+    return _iter_object(members())
 
 
 class CardEncoder(json.JSONEncoder):
@@ -22,8 +318,8 @@ class CardEncoder(json.JSONEncoder):
 def encode_pile(pile):
     piles = {}
 
-    for name, named_pile in pile.piles.items():
-        piles[name] = [encode_card(card) for card in named_pile]
+    for name, ordinals in pile.ordinals.items():
+        piles[name] = encode_ordinals(ordinals)
 
     return piles
 
@@ -34,11 +330,11 @@ class PileEncoder(json.JSONEncoder):
         return encode_pile(pile)
 
 def encode_deck(deck):
-    fields = ['cards', 'pile', 'count']
-    deck_object = deck.__dict__.items()
-    encoded_deck = dict((k, v) for k, v in deck_object if k in fields)
-    encoded_deck['cards'] = [encode_card(card) for card in deck.cards]
-    encoded_deck['pile'] = encode_pile(deck.pile)
+    encoded_deck = {
+        'cards': encode_ordinals(deck.ordinals),
+        'pile': encode_pile(deck.pile),
+        'count': deck.count,
+    }
 
     if deck.deck_model:
         encoded_deck['id'] = deck.deck_model.id
@@ -51,6 +347,11 @@ class DeckEncoder(json.JSONEncoder):
     def default(self, deck):
         return encode_deck(deck)
 
+    def encode(self, deck):
+        if isinstance(deck, models.Deck):
+            return dumps_deck(deck).decode('utf-8')
+        return super(DeckEncoder, self).encode(deck)
+
 
 def decode_card(card):
     if 'suit' in card and 'rank' in card:
@@ -84,9 +385,10 @@ class PileDecoder(object):
 
 def decode_deck(deck):
     if 'cards' in deck and 'pile' in deck:
-        cards = [decode_card(card) for card in deck['cards']]
+        ordinals = [decode_card(card).ordinal for card in deck['cards']]
         pile = decode_pile(deck['pile'])
-        return models.Deck(cards=cards, pile=pile)
+        return models.Deck(ordinals=ordinals, pile=pile,
+                           permutations=deck.get('permutations'))
     else:
         raise Exception("Cannot Decode Deck!")
 
@@ -95,3 +397,53 @@ class DeckDecoder(object):
 
     def decode(self, obj):
         return json.loads(obj, object_hook=decode_deck)
+
+
+def pack_ordinals(ordinals):
+    """Pack card ordinals into bytes, one byte per card"""
+    return bytes(bytearray(ordinals))
+
+
+def unpack_ordinals(data):
+    """Unpack bytes from :func:`pack_ordinals` into an array of ordinals"""
+    return array('B', bytes(data))
+
+
+def pack_pile(pile):
+    """Pack a Pile into a directory and bytes
+
+    Args:
+        pile (Pile): The Pile to pack
+
+    Returns:
+        tuple: The directory, a list of [name, count] pairs, and the piles'
+        card ordinals concatenated in directory order
+    """
+    directory, data = [], bytearray()
+
+    for name, ordinals in pile.ordinals.items():
+        directory.append([name, len(ordinals)])
+        data.extend(ordinals)
+
+    return directory, bytes(data)
+
+
+def unpack_pile(directory, data):
+    """Unpack the directory and bytes from :func:`pack_pile` into a Pile"""
+    return models.Pile(ordinals=unpack_pile_ordinals(directory, data))
+
+
+def unpack_pile_ordinals(directory, data):
+    """Unpack the directory and bytes from :func:`pack_pile` into a dict of
+    ordinal arrays, the storage of a Pile"""
+    ordinals = unpack_ordinals(data)
+    piles, offset = {}, 0
+
+    for name, count in directory:
+        piles[name] = ordinals[offset:offset + count]
+        offset += count
+
+    if offset != len(ordinals):
+        raise DecodeException("Cannot Decode Pile!")
+
+    return piles
@@ -0,0 +1,198 @@
+"""
+.. module:: deck.evaluate
+   :synopsis: Poker hand ranks and blackjack totals for hands of cards.
+
+Hands are sequences of card ordinals, such as the arrays a Deck draws with
+:func:`deck.models.Deck.draw_ordinals` or the named piles in
+:attr:`deck.models.Pile.ordinals`, so no Cards are built to evaluate them.
+
+:func:`poker_rank` scores the best five card poker hand among any number of
+cards, usually five or seven, as an int: a higher int is a better hand, and
+equal ints are equal hands. The straights and the kickers of every set of
+ranks are looked up in tables built once, when this module is imported, so
+a hand is scored with a pass over its cards and a few table lookups.
+
+:func:`blackjack_totals` counts a hand's hard and soft blackjack totals.
+:func:`evaluate_many` scores thousands of hands at once.
+
+"""
+
+HIGH_CARD, PAIR, TWO_PAIR, THREE_OF_A_KIND, STRAIGHT, FLUSH, FULL_HOUSE, \
+    FOUR_OF_A_KIND, STRAIGHT_FLUSH = range(9)
+
+CATEGORIES = ("high card", "pair", "two pair", "three of a kind", "straight",
+              "flush", "full house", "four of a kind", "straight flush")
+
+# Each card's rank, from 0 for a 2 to 12 for an Ace, and suit, indexed by
+# ordinal. See deck.models.Card.
+RANK = tuple(ordinal % 13 for ordinal in range(52))
+SUIT = tuple(ordinal // 13 for ordinal in range(52))
+
+# Each card's blackjack value, counting an Ace as 1, indexed by ordinal
+BLACKJACK_VALUE = tuple(min(rank + 2, 10) if rank < 12 else 1
+                        for rank in RANK)
+
+ACE = 12
+_WHEEL = (1 << ACE) | 0b1111
+
+
+def _straight_high(mask):
+    for high in range(ACE, 3, -1):
+        run = 0b11111 << (high - 4)
+        if mask & run == run:
+            return high
+    return 3 if mask & _WHEEL == _WHEEL else -1
+
+
+def _top_ranks(mask):
+    ranks = [rank for rank in range(ACE, -1, -1) if mask >> rank & 1][:5]
+    return sum(rank << 4 * (4 - i) for i, rank in enumerate(ranks))
+
+
+# Indexed by a 13 bit mask of ranks: the number of ranks in the mask, the
+# highest rank of the best straight in the mask, or -1, and the five
+# highest ranks in the mask, packed four bits each from the highest down
+RANK_COUNT = tuple(bin(mask).count('1') for mask in range(1 << 13))
+STRAIGHT_HIGH = tuple(_straight_high(mask) for mask in range(1 << 13))
+TOP_RANKS = tuple(_top_ranks(mask) for mask in range(1 << 13))
+
+
+def _score(category, ranks = 0):
+    return category << 20 | ranks
+
+
+def _kickers(mask, count, used):
+    """The count highest ranks in mask, packed below used ranks"""
+    return TOP_RANKS[mask] >> 4 * (5 - count) << 4 * (5 - used - count)
+
+
+def poker_rank(ordinals):
+    """Score the best five card poker hand among a hand of cards
+
+    Args:
+        ordinals (iterable of int): The card ordinals of the hand. Hands
+        dealt from several decks may hold the same card more than once.
+
+    Returns:
+        int: The hand's score. The category of the hand, see
+        :func:`category`, is in the bits above the 20th, and the ranks that
+        break ties between hands of that category are in the 20 bits below.
+    """
+    counts = [0] * 13
+    suit_masks = [0, 0, 0, 0]
+
+    for ordinal in ordinals:
+        rank = RANK[ordinal]
+        counts[rank] += 1
+        suit_masks[SUIT[ordinal]] |= 1 << rank
+
+    mask = suit_masks[0] | suit_masks[1] | suit_masks[2] | suit_masks[3]
+
+    flush = 0
+    for suit_mask in suit_masks:
+        if RANK_COUNT[suit_mask] >= 5:
+            high = STRAIGHT_HIGH[suit_mask]
+            if high >= 0:
+                flush = max(flush, _score(STRAIGHT_FLUSH, high << 16))
+            else:
+                flush = max(flush, _score(FLUSH, TOP_RANKS[suit_mask]))
+
+    quads, trips, pairs = -1, [], []
+    for rank in range(ACE, -1, -1):
+        count = counts[rank]
+        if count >= 4 and quads < 0:
+            quads = rank
+        elif count >= 3:
+            trips.append(rank)
+        elif count == 2:
+            pairs.append(rank)
+
+    if flush >> 20 == STRAIGHT_FLUSH:
+        return flush
+    if quads >= 0:
+        return _score(FOUR_OF_A_KIND, quads << 16 |
+                      _kickers(mask & ~(1 << quads), 1, 1))
+    if trips and (len(trips) > 1 or pairs):
+        pair = max(trips[1:] + pairs)
+        return _score(FULL_HOUSE, trips[0] << 16 | pair << 12)
+    if flush:
+        return flush
+
+    high = STRAIGHT_HIGH[mask]
+    if high >= 0:
+        return _score(STRAIGHT, high << 16)
+    if trips:
+        return _score(THREE_OF_A_KIND, trips[0] << 16 |
+                      _kickers(mask & ~(1 << trips[0]), 2, 1))
+    if len(pairs) > 1:
+        return _score(TWO_PAIR, pairs[0] << 16 | pairs[1] << 12 |
+                      _kickers(mask & ~(1 << pairs[0] | 1 << pairs[1]), 1, 2))
+    if pairs:
+        return _score(PAIR, pairs[0] << 16 |
+                      _kickers(mask & ~(1 << pairs[0]), 3, 1))
+    return _score(HIGH_CARD, TOP_RANKS[mask])
+
+
+def category(score):
+    """
+    Returns:
+        str: The name of the category of a score from :func:`poker_rank`,
+        such as "two pair"
+    """
+    return CATEGORIES[score >> 20]
+
+
+def blackjack_totals(ordinals):
+    """Count a hand's blackjack totals
+
+    Args:
+        ordinals (iterable of int): The card ordinals of the hand
+
+    Returns:
+        tuple: The hard total, counting every Ace as 1, and the soft total,
+        counting one Ace as 11. The soft total is None if the hand has no
+        Ace or counting one as 11 would bust it.
+    """
+    hard, aces = 0, False
+
+    for ordinal in ordinals:
+        hard += BLACKJACK_VALUE[ordinal]
+        aces = aces or RANK[ordinal] == ACE
+
+    soft = hard + 10 if aces and hard + 10 <= 21 else None
+    return hard, soft
+
+
+def evaluate(ordinals):
+    """Evaluate a hand for poker and for blackjack
+
+    Returns:
+        dict: The hand's "count" of cards, its "poker" score and
+        "category", and its "hard" and "soft" blackjack totals. The poker
+        score and category are None for an empty hand.
+    """
+    ordinals = list(ordinals)
+    hard, soft = blackjack_totals(ordinals)
+    score = poker_rank(ordinals) if ordinals else None
+
+    return {'count': len(ordinals), 'poker': score,
+            'category': category(score) if ordinals else None,
+            'hard': hard, 'soft': soft}
+
+
+def evaluate_many(hands, evaluator = poker_rank):
+    """Evaluate many hands
+
+    Args:
+        hands (iterable): Hands of card ordinals, such as the values of
+        :attr:`deck.models.Pile.ordinals`
+
+    Keyword Args:
+        evaluator (callable): Evaluates one hand. Defaults to
+        :func:`poker_rank`; pass :func:`blackjack_totals` or
+        :func:`evaluate` for the others.
+
+    Returns:
+        list: The evaluation of each hand, in order
+    """
+    return list(map(evaluator, hands))
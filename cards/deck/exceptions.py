@@ -3,3 +3,5 @@ class NotEnoughCardsException(Exception): pass
 class NoSuchDeckException(Exception): pass
 
 class DecodeException(Exception): pass
+
+class ConcurrentModificationException(Exception): pass
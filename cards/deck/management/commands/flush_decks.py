@@ -0,0 +1,34 @@
+"""
+.. module:: deck.management.commands.flush_decks
+   :synopsis: Write the decks saved only to a write-behind cache to the
+   database.
+
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from deck import models
+
+
+class Command(BaseCommand):
+    help = ("Write the decks whose changes are only in the deck store's "
+            "cache to the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help="Keep flushing, waiting this many seconds between flushes.")
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            written = models.deck_store.flush()
+            if int(options['verbosity']) > 1:
+                self.stdout.write("Wrote {} decks.".format(written))
+
+            if interval is None:
+                return
+            time.sleep(interval)
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import jsonfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deck', '0002_deckmodel_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deckmodel',
+            name='permutations',
+            field=jsonfield.fields.JSONField(default=[]),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from django.db import models, migrations
+import jsonfield.fields
+
+
+# The card ordinal table as of this migration, kept here so the migration
+# does not depend on the current models:
+# ordinal = suit index * 13 + rank value - 1
+SUITS = ["Clubs", "Diamonds", "Hearts", "Spades"]
+RANKS = [2, 3, 4, 5, 6, 7, 8, 9, 10, "Jack", "Queen", "King", "Ace"]
+
+
+def _load(value):
+    if isinstance(value, basestring):
+        return json.loads(value or 'null')
+    return value
+
+
+def _rank(rank):
+    try:
+        return int(rank)
+    except ValueError:
+        return rank
+
+
+def _ordinal(card):
+    return SUITS.index(card['suit']) * 13 + RANKS.index(_rank(card['rank']))
+
+
+def _card(ordinal):
+    return {'rank': RANKS[ordinal % 13], 'suit': SUITS[ordinal // 13]}
+
+
+def json_to_binary(apps, schema_editor):
+    DeckModel = apps.get_model('deck', 'DeckModel')
+
+    for deck_model in DeckModel.objects.all().iterator():
+        cards = _load(deck_model.cards) or []
+        pile = _load(deck_model.pile) or {}
+
+        directory, data = [], bytearray()
+        for name, named_pile in pile.items():
+            directory.append([name, len(named_pile)])
+            data.extend(_ordinal(card) for card in named_pile)
+
+        deck_model.card_data = bytes(bytearray(_ordinal(c) for c in cards))
+        deck_model.pile_directory = directory
+        deck_model.pile_data = bytes(data)
+        deck_model.save(update_fields=['card_data', 'pile_directory',
+                                       'pile_data'])
+
+
+def binary_to_json(apps, schema_editor):
+    DeckModel = apps.get_model('deck', 'DeckModel')
+
+    for deck_model in DeckModel.objects.all().iterator():
+        ordinals = bytearray(bytes(deck_model.card_data))
+        pile_ordinals = bytearray(bytes(deck_model.pile_data))
+
+        pile, offset = {}, 0
+        for name, count in _load(deck_model.pile_directory) or []:
+            pile[name] = [_card(o) for o in pile_ordinals[offset:offset + count]]
+            offset += count
+
+        deck_model.cards = [_card(o) for o in ordinals]
+        deck_model.pile = pile
+        deck_model.save(update_fields=['cards', 'pile'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deck', '0003_deckmodel_permutations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deckmodel',
+            name='card_data',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='deckmodel',
+            name='pile_data',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='deckmodel',
+            name='pile_directory',
+            field=jsonfield.fields.JSONField(default=[]),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+        migrations.RemoveField(
+            model_name='deckmodel',
+            name='cards',
+        ),
+        migrations.RemoveField(
+            model_name='deckmodel',
+            name='pile',
+        ),
+    ]
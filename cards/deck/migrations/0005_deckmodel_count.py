@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.db.models.functions import Length
+
+
+def count_card_data(apps, schema_editor):
+    # count was never updated after a deck was created, and it now marks
+    # how much of card_data is still in the deck
+    DeckModel = apps.get_model('deck', 'DeckModel')
+    DeckModel.objects.update(count=Length('card_data'))
+
+
+def truncate_card_data(apps, schema_editor):
+    # before this migration card_data held only the cards still in the
+    # deck, so the drawn cards past count are cut off
+    DeckModel = apps.get_model('deck', 'DeckModel')
+
+    for deck_model in DeckModel.objects.all().iterator():
+        card_data = bytes(deck_model.card_data)
+        if len(card_data) > deck_model.count:
+            deck_model.card_data = card_data[:deck_model.count]
+            deck_model.save(update_fields=['card_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deck', '0004_deckmodel_binary_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_card_data, truncate_card_data),
+    ]
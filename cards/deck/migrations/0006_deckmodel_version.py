@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deck', '0005_deckmodel_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deckmodel',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
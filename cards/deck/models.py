@@ -7,17 +7,35 @@
 """
 
 import collections
+import copy
 import json
 import random
+import threading
+import time
 import uuid
 
+from array import array
+
 from jsonfield import JSONField
 
-from django.db import models
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, models, transaction
+from django.utils.module_loading import import_string
 
 import encoders
 
-from .exceptions import NotEnoughCardsException, NoSuchDeckException
+from .cache import DeckCache
+from .exceptions import ConcurrentModificationException, \
+                        NotEnoughCardsException, NoSuchDeckException
+from .shuffles import Shuffler, binomial, get_shuffler, permute
 
 
 class Card(object):
@@ -27,10 +45,20 @@ class Card(object):
     are the strings Hearts, Clubs, Diamonds, or Spades. Options for a rank are
     the numbers 2 through 10, or the strings Jack, Queen, King, or Ace.
 
+    Cards are immutable flyweights: there are exactly 52 Card instances per
+    process, and Card(rank, suit) returns the canonical instance rather than
+    building a new object. Each card also carries a small integer ordinal
+    (0 through 51) which can be used to look it up with
+    :func:`Card.from_ordinal`.
+
     Card implements comparison using the dunder methods :func:__eq__ and
-    :func:__lt__ against encoded ranks.
+    :func:__lt__. Cards are ordered by rank and then by suit, by their
+    precomputed :attr:`Card.sort_key`, and are only equal to themselves.
+    Against a rank, a card compares its rank alone.
     """
 
+    __slots__ = ('rank', 'suit', 'code', 'ordinal', 'value', 'sort_key')
+
     SUITS = {
         "Hearts": "H", "Clubs": "C",
         "Diamonds": "D", "Spades": "S",
@@ -44,8 +72,12 @@ class Card(object):
         "King": 12, "Ace": 13,
     }
 
-    def __init__(self, rank, suit):
-        """Initialize a Card: Card(rank, suit)
+    # The canonical instances, populated once when this module is imported
+    _interned = {}
+    _by_ordinal = []
+
+    def __new__(cls, rank, suit):
+        """Look up a Card: Card(rank, suit)
 
         Args:
             rank (int or str): The cards rank
@@ -54,81 +86,132 @@ class Card(object):
         Attributes:
             rank (int or str): The cards rank
             suit (str): The cards suit
+            code (tuple): The encoded suit and rank of the card
+            ordinal (int): The card's position in the canonical 52 card table,
+            which orders cards by suit and then by rank
+            value (int): The encoded rank of the card
+            sort_key (int): A number between 0 and 51 which orders cards by
+            rank and then by suit
 
         Raises:
             Exception if invalid suits or ranks are passed
         """
         try:
-            self.rank = rank
-            self.suit = suit
-            self.code = (self.SUITS[suit], self.RANKS[rank])
-        except KeyError as e:
+            return cls._interned[(rank, suit)]
+        except (KeyError, TypeError):
             raise Exception("Invalid Card.")
 
+    @classmethod
+    def _intern(cls, rank, suit, ordinal):
+        card = object.__new__(cls)
+        object.__setattr__(card, 'rank', rank)
+        object.__setattr__(card, 'suit', suit)
+        object.__setattr__(card, 'code', (cls.SUITS[suit], cls.RANKS[rank]))
+        object.__setattr__(card, 'ordinal', ordinal)
+        object.__setattr__(card, 'value', cls.RANKS[rank])
+        object.__setattr__(card, 'sort_key', (cls.RANKS[rank] - 1) * 4 +
+                           sorted(cls.SUITS.keys()).index(suit))
+        cls._interned[(rank, suit)] = card
+        cls._by_ordinal.append(card)
+        return card
+
+    @classmethod
+    def from_ordinal(cls, ordinal):
+        """Look up a Card by its ordinal
+
+        Args:
+            ordinal (int): A number between 0 and 51
+
+        Returns:
+            Card: The canonical Card with that ordinal
+
+        Raises:
+            Exception if the ordinal is out of range
+        """
+        if 0 <= ordinal < len(cls._by_ordinal):
+            return cls._by_ordinal[ordinal]
+        raise Exception("Invalid Card.")
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Cards are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Cards are immutable")
+
+    def __reduce__(self):
+        return (Card, (self.rank, self.suit))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __hash__(self):
+        return self.ordinal
+
     def __eq__(self, other):
         """Determine if a card is equal to a given value
 
         Args:
             other (int or str or |card|): Value or reference to compare against
 
-        Raises:
-            Exception if the :param other: is invalid.
-
         Returns:
             bool: True if |self| and :param other: other are equal, and False
-            otherwise
+            otherwise. NotImplemented if :param other: is neither a rank nor a
+            |card|.
 
         Compare the rank value of a :type str: or :type int: against
         |self|'s rank. If :param other: is a |card|, both suit and rank must be
-        equal.
+        equal. Since cards are interned, that is an identity check.
         """
-        suit, rank = self.code
-        try:
-            other_rank = self.RANKS[other]
+        if isinstance(other, Card):
+            return self is other
 
-            if rank == other_rank:
-                return True
-            return False
-        except KeyError:
-            try:
-                other_suit, other_rank = other.code
-
-                if suit == other_suit and rank == other_rank:
-                    return True
-                return False
-            except AttributeError:
-                raise Exception
+        other_value = self._value_of(other)
+        if other_value is None:
+            return NotImplemented
+        return self.value == other_value
 
     def __ne__(self, other):
-        return not self == other
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
 
-    def _calculate_rank(self, other):
-        """Translate the rank of another card or rank value into an encoded rank
+    def _value_of(self, other):
+        """Translate a rank value into an encoded rank
 
         Args:
-            other (int or str or Card): a rank or Card
-
-        Raises:
-            Exception if the :param other: is invalid.
+            other (int or str): a rank
 
         Returns:
-            tuple: The encoded ranks of both self and other, respectively
+            int or None: The encoded rank of :param other:, or None if it is
+            not a rank.
 
-        Generate a tuple with the encoded ranks of both |self| and the
-        :param other:. This rank is used internally to make comparisons easier
-        to implement.
+        This lookup is used internally to make comparisons easier to
+        implement, and never raises for an invalid :param other:.
         """
-        _, rank = self.code
-
         try:
-            other_rank = Card.RANKS[other]
-        except KeyError:
-            try:
-                _, other_rank = other.code
-            except AttributeError:
-                raise Exception
+            return self.RANKS.get(other)
+        except TypeError:
+            return None
+
+    def _keys(self, other):
+        """The keys to compare |self| and :param other: by
 
-        return rank, other_rank
+        Returns:
+            tuple or None: The sort keys of both cards if :param other: is a
+            |card|, the encoded ranks of both if it is a rank, and None
+            otherwise.
+        """
+        if isinstance(other, Card):
+            return self.sort_key, other.sort_key
+
+        other_value = self._value_of(other)
+        if other_value is None:
+            return None
+        return self.value, other_value
 
     def __lt__(self, other):
         """Determine if a card is less than a given value
@@ -136,21 +219,18 @@ class Card(object):
         Args:
             other (int or str or |card|): Value or reference to compare against
 
-        Raises:
-            Exception if the :param other: is invalid.
-
         Returns:
-            bool: True if |self| is less than :param other:, False otherwise
+            bool: True if |self| is less than :param other:, False otherwise.
+            NotImplemented if :param other: is neither a rank nor a |card|.
 
-        Compare the rank value of a :type str: or :type int: against
-        |self|'s rank. If :param other: is a |card|, both suit and rank must be
-        equal.
+        Cards are compared by rank and then by suit, using their sort keys.
+        A :type str: or :type int: rank is compared against |self|'s rank
+        alone.
         """
-        rank, other_rank = self._calculate_rank(other)
-
-        if rank < other_rank:
-            return True
-        return False
+        keys = self._keys(other)
+        if keys is None:
+            return NotImplemented
+        return keys[0] < keys[1]
 
     def __le__(self, other):
         """Determine if a card is less than or equal to a given value
@@ -158,44 +238,47 @@ class Card(object):
         Args:
             other (int or str or |card|): Value or reference to compare against
 
-        Raises:
-            Exception if the :param other: is invalid.
-
         Returns:
             bool: True if |self| is less than or equal to :param other:, False
-            otherwise
+            otherwise. NotImplemented if :param other: is neither a rank nor a
+            |card|.
         """
-        return (self < other) or (self == other)
+        keys = self._keys(other)
+        if keys is None:
+            return NotImplemented
+        return keys[0] <= keys[1]
 
     def __gt__(self, other):
-        """Determine if a card is less than or equal to a given value
+        """Determine if a card is greater than a given value
 
         Args:
             other (int or str or |card|): Value or reference to compare against
 
-        Raises:
-            Exception if the :param other: is invalid.
-
         Returns:
-            bool: True if |self| is greater than :param other:, False otherwise
+            bool: True if |self| is greater than :param other:, False
+            otherwise. NotImplemented if :param other: is neither a rank nor a
+            |card|.
         """
-
-        return (not self < other) and (not self == other)
+        keys = self._keys(other)
+        if keys is None:
+            return NotImplemented
+        return keys[0] > keys[1]
 
     def __ge__(self, other):
-        """Determine if a card is less than or equal to a given value
+        """Determine if a card is greater than or equal to a given value
 
         Args:
             other (int or str or |card|): Value or reference to compare against
 
-        Raises:
-            Exception if the :param other: is invalid.
-
         Returns:
             bool: True if |self| is greater than or equal to :param other:,
-            False otherwise
+            False otherwise. NotImplemented if :param other: is neither a rank
+            nor a |card|.
         """
-        return (self > other) or (self == other)
+        keys = self._keys(other)
+        if keys is None:
+            return NotImplemented
+        return keys[0] >= keys[1]
 
     def __str__(self):
         return "{} of {}".format(self.rank, self.suit)
@@ -204,37 +287,176 @@ class Card(object):
         return "{} of {}".format(self.rank, self.suit)
 
 
+# Intern the 52 canonical cards. Ordinals are laid out suit by suit, and ranks
+# within a suit from 2 up to Ace.
+for _suit in sorted(Card.SUITS.keys()):
+    for _rank in sorted(Card.RANKS.keys(), key=Card.RANKS.get):
+        Card._intern(_rank, _suit, len(Card._by_ordinal))
+del _suit, _rank
+
+# The 52 canonical cards, indexed by ordinal
+CARDS = tuple(Card._by_ordinal)
+
+# The ordinals of the 52 cards, ordered by rank or by suit
+SORT_ORDERS = {
+    'rank': tuple(card.ordinal for card in sorted(CARDS,
+                                                  key=lambda c: c.sort_key)),
+    'suit': tuple(card.ordinal for card in CARDS),
+}
+
+# Each card's sort_key, indexed by ordinal
+SORT_KEYS = tuple(card.sort_key for card in CARDS)
+
+# The ordinals of the four cards of each rank
+RANK_ORDINALS = dict((rank, tuple(card.ordinal for card in CARDS
+                                  if card.rank == rank))
+                     for rank in Card.RANKS)
+
+# The order in which a fresh, unshuffled Deck lays out its cards
+DECK_LAYOUT = tuple(Card(rank, suit)
+                    for suit in sorted(Card.SUITS.keys())
+                    for rank in sorted(Card.RANKS.keys()))
+
+_LAYOUT_ORDINALS = array('B', [card.ordinal for card in DECK_LAYOUT])
+
+
+def lay_out(n = 1):
+    """Lay out the ordinals of a fresh, unshuffled shoe of n decks
+
+    Args:
+        n (int): The number of decks in the shoe
+
+    Returns:
+        array: 52 * n card ordinals, with the n copies of each card next to
+        each other, in :data:`DECK_LAYOUT` order
+
+    The shoe is built in bulk, with numpy.repeat when NumPy is installed and
+    with array multiplication otherwise, rather than card by card.
+    """
+    if numpy is not None:
+        layout = numpy.frombuffer(_LAYOUT_ORDINALS, dtype=numpy.uint8)
+        return array('B', numpy.repeat(layout, max(n, 0)).tobytes())
+
+    ordinals = array('B')
+    for ordinal in _LAYOUT_ORDINALS:
+        ordinals.extend(array('B', [ordinal]) * n)
+    return ordinals
+
+
 class Deck(object):
     """Deck: A Deck of Playing Cards
 
     A container for |card| objects. If you need persistence, use the
     DeckModel.create_deck.
+
+    Internally, the order of the cards is kept as a compact buffer of card
+    ordinals (see :func:`Card.from_ordinal`), one byte per card. Card objects
+    are only looked up when cards leave the Deck, e.g. when they are drawn.
     """
 
+    # Apply pending permutations on save once there are more than this many
+    MAX_PERMUTATIONS = 16
+    MAX_RETRIES = 8
+    # Seven riffles mix a deck; more than this only costs time
+    MAX_PASSES = 20
+
     @staticmethod
-    def get(id):
+    def get(id, lock = False):
         """Retrieve a saved Deck
 
         Args:
             id (str): A UUID associated with a saved Deck
 
+        Keyword Args:
+            lock (bool): Lock the Deck's row with SELECT ... FOR UPDATE until
+            the end of the current transaction. Locked Decks are never read
+            from :data:`deck_cache`.
+
         Returns:
             Deck: a Deck with UUID id
 
         Raises:
             NoSuchDeckException if the Deck does not exist
-        """
-        try:
-            deck_model = DeckModel.objects.get(pk=id)
-        except Exception:
-            raise NoSuchDeckException("No Such Deck Exists")
 
+        Decks are read from :data:`deck_cache`, then from :data:`deck_store`.
+        A Deck found in :data:`deck_cache` is only used if its version is
+        still the stored version, which is read on its own, so Decks saved
+        or deleted by other processes are never served from the cache.
+        """
+        if not lock:
+            cached_deck = deck_cache.get(id)
+            if cached_deck is not None:
+                if deck_store.get_version(id) == \
+                        cached_deck.deck_model.version:
+                    return cached_deck
+                deck_cache.invalidate(id)
+
+        deck_model = deck_store.get(id, lock=lock)
         decoded_deck = deck_model.decode()
         decoded_deck.deck_model = deck_model
+        decoded_deck._mark_saved()
+        decoded_deck._cache()
         return decoded_deck
 
+    @staticmethod
+    def modify(id, operation, lock = False, retries = MAX_RETRIES):
+        """Apply an operation to a saved Deck and save it, atomically
+
+        Args:
+            id (str): A UUID associated with a saved Deck
+
+            operation (callable): Called with the Deck. Its return value is
+            returned once the Deck has been saved.
+
+        Keyword Args:
+            lock (bool): Lock the Deck's row while the operation runs, so
+            that concurrent modifications wait for each other instead of
+            being retried
+
+            retries (int): How many more times to load the Deck and apply
+            the operation if another request saved the Deck first, or the
+            database could not lock it
+
+        Returns:
+            The return value of operation
+
+        Raises:
+            NoSuchDeckException if the Deck does not exist
+
+            ConcurrentModificationException if another request saved the
+            Deck first every time
+
+            OperationalError if the database could not lock the Deck the
+            last time
+
+        Nothing is saved if the operation raises an exception. The saved
+        Deck is only cached once its transaction has committed.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with transaction.atomic():
+                    deck = Deck.get(id, lock=lock)
+                    result = operation(deck)
+                    deck.save()
+            except (ConcurrentModificationException, OperationalError) as e:
+                deck_cache.invalidate(id)
+                deck_store.rollback()
+                error = e
+            except:
+                deck_cache.invalidate(id)
+                deck_store.rollback()
+                raise
+            else:
+                deck_store.commit()
+                deck._cache()
+                return result
+
+        raise error
+
     def __init__(self, n = 1, cards = None, pile = None,
-                 deck_model = None, shuffle = True):
+                 deck_model = None, shuffle = True, ordinals = None,
+                 shuffler = None, seed = None, permutations = None,
+                 card_data = None):
         """Initialize a Deck: Deck(n, cards, pile, deck_model, shuffle)
 
         Attributes:
@@ -247,6 +469,8 @@ class Deck(object):
 
             cards (Card list): The Deck's cards
 
+            ordinals (array): The Deck's cards, as an array of card ordinals
+
             count (int): The total number of cards in the Deck
 
         Keyword Args:
@@ -257,26 +481,130 @@ class Deck(object):
             the Deck.
 
             pile (Pile or None): Use a Pile for the Deck's pile
+
+            ordinals (sequence of int or None): Use a sequence of card
+            ordinals to populate the Deck. This takes precedence over cards.
+
+            shuffler (Shuffler or str or None): The strategy the Deck shuffles
+            with, or its name. See :func:`deck.shuffles.get_shuffler`.
+
+            seed (int or None): Seed the Deck's shuffler, so that its shuffles
+            can be reproduced
+
+            permutations (list or None): Permutation descriptors to apply to
+            the Deck's cards before they are next used. See
+            :mod:`deck.shuffles`.
+
+            card_data (bytes or None): Use packed card ordinals, as stored by
+            :class:`DeckModel`, to populate the Deck. They are unpacked the
+            first time the Deck's cards are used.
         """
         self.pile = pile or Pile()
         self.deck_model = deck_model
         self.encoder = encoders.DeckEncoder()
-
-        if cards:
+        self._positions = None
+        self._shuffler = shuffler
+        self._seed = seed
+        self._permutations = list(permutations or [])
+        self._cards_changed = True
+        self._saved_count = None
+
+        if ordinals is not None:
+            self._ordinals = array('B', ordinals)
+        elif card_data is not None:
+            self._card_data = card_data
+        elif cards:
             self.cards = cards
         else:
-            self.cards = []
-
-            suits, ranks = sorted(Card.SUITS.keys()), sorted(Card.RANKS.keys())
-            for suit in suits:
-                for rank in ranks:
-                    for i in range(0, n):
-                        self.cards.append(Card(rank, suit))
+            self._ordinals = lay_out(n)
 
             if shuffle:
                 self.shuffle()
 
-        self.count = len(self.cards)
+    def __getattr__(self, name):
+        """Unpack the Deck's card data the first time its ordinals are used"""
+        if name == '_ordinals' and '_card_data' in self.__dict__:
+            self._ordinals = encoders.unpack_ordinals(
+                self.__dict__.pop('_card_data'))
+            return self._ordinals
+        raise AttributeError(name)
+
+    @property
+    def cards(self):
+        """
+        Returns:
+            Card list: The Deck's cards, from the bottom of the Deck to the top
+
+        A new list is built on every access; mutating it does not change the
+        Deck. Note that this is a property.
+        """
+        self._permute()
+        return list(map(CARDS.__getitem__, self._ordinals))
+
+    @cards.setter
+    def cards(self, cards):
+        self._ordinals = array('B', [card.ordinal for card in cards])
+        self._permutations = []
+        self._positions = None
+        self._cards_changed = True
+
+    @property
+    def ordinals(self):
+        """
+        Returns:
+            array: The Deck's cards as an array of card ordinals
+
+        This is the Deck's underlying storage rather than a copy, so treat it
+        as read only and use the Deck's methods to change it. Note that this
+        is a property.
+        """
+        self._permute()
+        return self._ordinals
+
+    @property
+    def permutations(self):
+        """
+        Returns:
+            list: The permutation descriptors recorded by :func:`cut`,
+            :func:`riffle` and partial shuffles, which have not been applied
+            to the Deck's cards yet. Note that this is a property.
+        """
+        return list(self._permutations)
+
+    def _permute(self):
+        """Apply pending permutation descriptors to the Deck's cards"""
+        if self._permutations:
+            for descriptor in self._permutations:
+                permute(self._ordinals, descriptor)
+
+            self._permutations = []
+            self._positions = None
+            self._cards_changed = True
+
+    @property
+    def count(self):
+        """
+        Returns:
+            int: The total number of cards in the Deck
+        """
+        if '_card_data' in self.__dict__:
+            return len(self._card_data)
+        return len(self._ordinals)
+
+    @property
+    def shuffler(self):
+        """
+        Returns:
+            Shuffler: The strategy the Deck shuffles with
+
+        The Shuffler is created the first time the Deck is shuffled, so decks
+        which are never shuffled never pay for seeding a generator. Note that
+        this is a property.
+        """
+        if not isinstance(self._shuffler, Shuffler) or self._seed is not None:
+            self._shuffler = get_shuffler(self._shuffler, seed=self._seed)
+            self._seed = None
+        return self._shuffler
 
     @property
     def id(self):
@@ -296,23 +624,223 @@ class Deck(object):
             raise Exception("No ID set: Use DeckModel.create_deck() instead")
 
     def __iter__(self):
-        return iter(self.cards)
+        return (CARDS[ordinal] for ordinal in self.ordinals)
 
-    def shuffle(self):
+    def shuffle(self, seed = None, top = None):
         """Shuffle the cards of the deck
 
+        Keyword Args:
+            seed (int or None): Reseed the Deck's shuffler before shuffling
+
+            top (int or None): Only shuffle this many cards from the top of
+            the Deck
+
+        Returns:
+            None: This method mutates the ordering of the cards
+
+        Raises:
+            NotEnoughCardsException if :param top: is larger than the Deck
+
+        Randomize the ordering of the Deck's cards with the Deck's
+        :attr:`shuffler`, permuting the ordinal buffer in place. Shuffling
+        only the top of the Deck is recorded as a permutation descriptor, and
+        applied when the cards are next used.
+        """
+        if seed is not None:
+            self._seed = seed
+
+        if top is not None:
+            self._check_depth(top)
+            self._permutations.append(["top", top,
+                                       self.shuffler.random_seed()])
+            return
+
+        self._permute()
+        self.shuffler.shuffle(self._ordinals)
+        self._positions = None
+        self._cards_changed = True
+
+    def cut(self, at = None, seed = None):
+        """Cut the deck, moving cards from the top to the bottom
+
+        Keyword Args:
+            at (int or None): The number of cards to move. When None, the
+            Deck is cut near the middle, at a binomially distributed point.
+
+            seed (int or None): Reseed the Deck's shuffler first
+
+        Returns:
+            None: This method mutates the ordering of the cards
+
+        Raises:
+            NotEnoughCardsException if :param at: is larger than the Deck
+
+        The cut is recorded as a permutation descriptor, and applied when the
+        cards are next used.
+        """
+        if seed is not None:
+            self._seed = seed
+
+        if at is None:
+            at = binomial(random.Random(self.shuffler.random_seed()),
+                          self.count)
+
+        self._check_depth(at)
+        self._permutations.append(["cut", at])
+
+    def riffle(self, passes = 1, seed = None):
+        """Riffle shuffle the deck
+
+        Keyword Args:
+            passes (int): The number of riffles, from 1 to
+            :attr:`MAX_PASSES`
+
+            seed (int or None): Reseed the Deck's shuffler first
+
+        Returns:
+            None: This method mutates the ordering of the cards
+
+        Raises:
+            Exception if :param passes: is less than 1 or more than
+            :attr:`MAX_PASSES`
+
+        The riffles are recorded as a permutation descriptor, and applied
+        when the cards are next used. See :func:`deck.shuffles.riffle`.
+        """
+        if passes < 1:
+            raise Exception("You must riffle at least once.")
+        if passes > self.MAX_PASSES:
+            raise Exception("You may riffle at most {} times.".format(
+                self.MAX_PASSES))
+        if seed is not None:
+            self._seed = seed
+
+        self._permutations.append(["riffle", passes,
+                                   self.shuffler.random_seed()])
+
+    def _check_depth(self, n):
+        if not 0 <= n <= self.count:
+            raise NotEnoughCardsException("The deck does not have that many"
+                                          " cards!")
+
+    def _sorted_ordinals(self, by, reverse):
+        try:
+            order = SORT_ORDERS[by]
+        except KeyError:
+            raise Exception("You can only sort by rank or suit.")
+
+        self._permute()
+
+        if by == 'suit':
+            return array('B', sorted(self._ordinals, reverse=reverse))
+
+        # sort the cards' rank-major keys, which are plain integers, and map
+        # them back to ordinals
+        keys = sorted(map(SORT_KEYS.__getitem__, self._ordinals),
+                      reverse=reverse)
+        return array('B', map(order.__getitem__, keys))
+
+    def sort(self, by = "rank", reverse = False):
+        """Sort the cards of the deck
+
+        Keyword Args:
+            by (str): Either "rank", to order cards by rank and then by suit,
+            or "suit", to order them by suit and then by rank
+
+            reverse (bool): Put the lowest cards on top rather than the
+            highest
+
         Returns:
             None: This method mutates the ordering of the cards
 
-        Randomize the ordering of the Deck's cards.
+        Raises:
+            Exception if :param by: is neither "rank" nor "suit"
         """
-        random.shuffle(self.cards)
+        self._ordinals = self._sorted_ordinals(by, reverse)
+        self._positions = None
+        self._cards_changed = True
+
+    def sorted_by(self, by = "rank", reverse = False):
+        """Get the cards of the deck in sorted order
+
+        Keyword Args:
+            by (str): Either "rank" or "suit"; see :func:`Deck.sort`
+
+            reverse (bool): Sort from the highest card to the lowest
+
+        Returns:
+            Card list: The Deck's cards in sorted order. The Deck itself is
+            left as it is.
+
+        Raises:
+            Exception if :param by: is neither "rank" nor "suit"
+        """
+        return list(map(CARDS.__getitem__,
+                        self._sorted_ordinals(by, reverse)))
+
+    def _index(self):
+        """Build the Deck's position index
+
+        Returns:
+            list: For each card ordinal, the ascending list of positions at
+            which that card appears in the Deck
+
+        The index is built lazily, on the first search after the Deck is
+        created or shuffled, and is kept up to date as cards are drawn.
+        """
+        self._permute()
+
+        if self._positions is None:
+            positions = [[] for card in CARDS]
+
+            for i, ordinal in enumerate(self._ordinals):
+                positions[ordinal].append(i)
+
+            self._positions = positions
+        return self._positions
+
+    def find(self, value, from_top = False):
+        """Find the position of a card or a rank in the Deck
+
+        Args:
+            value (Card or int or str): A Card, or a rank such as 10 or "Ace"
+
+        Keyword Args:
+            from_top (bool): Find the occurrence closest to the top of the
+            Deck rather than the one closest to the bottom.
+
+        Returns:
+            int: The index of the card in the cards list, or -1 if the Deck
+            contains no such card.
+
+        Raises:
+            Exception if :param value: is neither a Card nor a rank
+
+        Lookups go through the position index, so they take constant time
+        however many decks are in the shoe.
+        """
+        positions = self._index()
+
+        if isinstance(value, Card):
+            ordinals = (value.ordinal,)
+        else:
+            try:
+                ordinals = RANK_ORDINALS[value]
+            except (KeyError, TypeError):
+                raise Exception("You can only find a Card or a rank.")
+
+        found = [positions[o][-1 if from_top else 0]
+                 for o in ordinals if positions[o]]
+
+        if not found:
+            return -1
+        return max(found) if from_top else min(found)
 
     def _search(self, till):
         """Search for a card in the Deck
 
         Args:
-            till (Card): A card to search the Deck for.
+            till (Card or int or str): A card or rank to search the Deck for.
 
         Returns:
             int: The index of the card in the cards list, or -1 if the Deck
@@ -320,10 +848,7 @@ class Deck(object):
 
         This function helps implement some of the draw method's functionality.
         """
-        for i, card in enumerate(self):
-            if card == till:
-                return i
-        return -1
+        return self.find(till)
 
     def draw(self, n = 1, till = None, from_pile = None):
         if from_pile:
@@ -333,28 +858,63 @@ class Deck(object):
             raise NotEnoughCardsException("You're trying to draw more cards"
                                           " than are in the deck!")
         else:
-            cards = []
-            pool = self.cards[:]
-
             if till:
                 index = self._search(till)
                 if index >= 0:
-                    pool, cards = pool[:index], pool[index:len(pool)]
+                    cards = self._take(index)
                     cards.reverse()
                 else:
-                    cards, pool = pool, cards
+                    cards = self._take(0)
             else:
-                while n > 0:
-                    cards.append(pool.pop())
-                    n -= 1
+                cards = self.draw_ordinals(n)
 
+            cards = list(map(CARDS.__getitem__, cards))
             if len(cards) == 1:
                 cards = cards[0]
 
-            self.cards = pool
-            self.count = len(self.cards)
             return cards
 
+    def draw_ordinals(self, n = 1):
+        """Draw n cards from the top of the Deck, without building Cards
+
+        Returns:
+            array: The drawn card ordinals, from the top of the Deck down
+
+        Raises:
+            NotEnoughCardsException if the Deck has fewer than n cards
+        """
+        if not self.has_cards() or n > self.count:
+            raise NotEnoughCardsException("You're trying to draw more cards"
+                                          " than are in the deck!")
+
+        ordinals = self._take(self.count - n)
+        ordinals.reverse()
+        return ordinals
+
+    def _take(self, index):
+        """Remove the cards from index to the top of the Deck
+
+        Args:
+            index (int): The position of the lowest card to remove
+
+        Returns:
+            array: The removed ordinals, from the bottom to the top
+
+        Only the removed cards are copied, so taking k cards costs O(k) no
+        matter how many cards remain in the Deck. The cards below index are
+        left as they were, so saving only has to store the new count.
+        """
+        self._permute()
+        cards = self._ordinals[index:]
+        del self._ordinals[index:]
+
+        if self._positions is not None:
+            # the removed cards sit above every remaining copy of themselves
+            for ordinal in cards:
+                self._positions[ordinal].pop()
+
+        return cards
+
     def discard(self, card, into = None):
         self.pile.push(card, into=into)
 
@@ -366,21 +926,117 @@ class Deck(object):
     def encode(self):
         return self.encoder.default(self)
 
+    def dumps(self, fields = ('id', 'count', 'cards', 'pile')):
+        """Encode the Deck straight to JSON
+
+        Keyword Args:
+            fields (tuple of str): The fields to include, in order
+
+        Returns:
+            JSONBytes: The encoded Deck. See :func:`encoders.dumps_deck`.
+        """
+        return encoders.dumps_deck(self, fields=fields)
+
     def save(self):
+        """Save the Deck to its DeckModel
+
+        Raises:
+            Exception if the Deck has no DeckModel
+
+            ConcurrentModificationException if the Deck was saved by another
+            request since it was loaded. See :func:`modify`.
+
+        Only the fields which have changed since the Deck was loaded or last
+        saved are written. The stored cards are only rewritten if they were
+        reordered: drawing only removes cards from the top, so the stored
+        card data is kept and the stored count, which marks how much of it
+        is still in the Deck, is updated instead. Cuts, riffles and partial
+        shuffles which have not been applied yet are saved as permutation
+        descriptors, up to :attr:`MAX_PERMUTATIONS` of them.
+        """
         if self.deck_model:
-            encoded_deck = self.encode()
-            self.deck_model.cards = encoded_deck['cards']
-            self.deck_model.pile  = encoded_deck['pile']
-            self.deck_model.save()
+            if len(self._permutations) > self.MAX_PERMUTATIONS:
+                self._permute()
+
+            fields = []
+
+            if self._cards_changed:
+                self.deck_model.card_data = encoders.pack_ordinals(
+                    self._ordinals)
+                fields.append('card_data')
+
+            if self._cards_changed or self.count != self._saved_count:
+                self.deck_model.count = self.count
+                fields.append('count')
+
+            if self.pile._changed:
+                self.deck_model.pile_directory, self.deck_model.pile_data = \
+                    encoders.pack_pile(self.pile)
+                fields.extend(['pile_directory', 'pile_data'])
+
+            if self._permutations != self.deck_model.permutations:
+                self.deck_model.permutations = self.permutations
+                fields.append('permutations')
+
+            if fields:
+                try:
+                    deck_store.save(self.deck_model, fields)
+                except ConcurrentModificationException:
+                    deck_cache.invalidate(self.id)
+                    raise
+            self._mark_saved()
+            self._cache()
         else:
             raise Exception("No Deck Model Set!")
 
+    def _cache(self):
+        """Put the saved Deck in :data:`deck_cache`
+
+        Inside a transaction the Deck is removed from the cache instead,
+        since the transaction could still be rolled back. Pending
+        permutation descriptors are applied to the cached copy, so they are
+        replayed once rather than on every copy the cache hands out.
+        """
+        if transaction.get_connection().in_atomic_block:
+            deck_cache.invalidate(self.id)
+        elif self._permutations:
+            deck = copy.copy(self)
+            deck._permute()
+            deck_cache.put(deck)
+        else:
+            deck_cache.put(self)
+
+    def _mark_saved(self):
+        """Record that the Deck matches its DeckModel"""
+        self._cards_changed = False
+        self._saved_count = self.count
+        self.pile._changed = False
+
     def delete(self):
         if self.deck_model:
-            self.deck_model.delete()
+            deck_cache.invalidate(self.id)
+            deck_store.delete(self.deck_model)
         else:
             raise Exception("No Deck Model Set!")
 
+    def __copy__(self):
+        """Copy the Deck, so that changing the copy leaves the Deck as it
+        was. The copy has a copy of the Deck's DeckModel."""
+        deck = Deck.__new__(Deck)
+        deck.__dict__.update(self.__dict__)
+
+        if '_ordinals' in self.__dict__:
+            deck._ordinals = self._ordinals[:]
+
+        deck.pile = copy.copy(self.pile)
+        deck._permutations = list(self._permutations)
+        deck._positions = None
+
+        if self.deck_model is not None:
+            deck.deck_model = copy.copy(self.deck_model)
+
+        return deck
+
     def __str__(self):
         string  = "Count: {}\n".format(self.count)
         string += "*" * len(string) + "\n"
@@ -394,11 +1050,28 @@ class Deck(object):
 
 
 class DeckModel(models.Model):
+    """DeckModel: The Stored Form of a Deck
+
+    Cards are stored in a compact binary format: card_data holds one byte
+    per card ordinal, from the bottom of the Deck to the top. Only the first
+    count of them are in the Deck; the rest have been drawn. The piles'
+    cards are concatenated in the same way in pile_data, and pile_directory
+    lists the name and number of cards of each pile, in order, as
+    [[name, count], ...].
+
+    count and pile_directory are kept up to date by every save, so a Deck's
+    count and pile counts can be read from them without reading the cards.
+    """
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     count = models.IntegerField()
-    cards = JSONField()
-    pile  = JSONField()
+    card_data = models.BinaryField(default=b'')
+    pile_data = models.BinaryField(default=b'')
+    pile_directory = JSONField(default=[])
+    permutations = JSONField(default=[])
+    version = models.IntegerField(default=0)
+
+    BULK_BATCH_SIZE = 500
 
     def __repr__(self):
         return str(self.id)
@@ -406,64 +1079,276 @@ class DeckModel(models.Model):
     def __unicode__(self):
         return str(self.id)
 
+    @property
+    def pile(self):
+        """
+        Returns:
+            dict: The encoded piles, as {name: [{"rank", "suit"}, ...]}
+
+        Only the piles are decoded. Note that this is a property.
+        """
+        return encoders.encode_pile(self.decode_pile())
+
+    def save_fields(self, fields):
+        """Save some of the fields, if the row has not been saved since it
+        was loaded
+
+        Args:
+            fields (list of str): The names of the fields to save
+
+        Raises:
+            ConcurrentModificationException if the row's version has changed
+
+        The row's version is checked and incremented in the same UPDATE.
+        """
+        values = dict((field, getattr(self, field)) for field in fields)
+        updated = DeckModel.objects.filter(
+            pk=self.pk, version=self.version).update(
+                version=models.F('version') + 1, **values)
+
+        if not updated:
+            raise ConcurrentModificationException("The Deck was modified by "
+                                                  "another request.")
+        self.version += 1
+
+    @property
+    def pile_counts(self):
+        """
+        Returns:
+            dict: The number of cards in each pile, by name, read from the
+            pile directory alone. Note that this is a property.
+        """
+        return dict(self.pile_directory)
+
+    def decode_pile(self):
+        return encoders.unpack_pile(self.pile_directory, self.pile_data)
+
     def decode(self):
-        deck_object = {'cards': self.cards, 'pile': self.pile}
-        return encoders.decode_deck(deck_object)
+        """Decode the stored Deck
+
+        Returns:
+            Deck: The Deck. Its cards and piles are decoded independently,
+            the first time each is used, so requests which only need the
+            count or the piles never unpack the cards.
+        """
+        return Deck(card_data=self.card_data[:self.count],
+                    pile=Pile(packed=(self.pile_directory, self.pile_data)),
+                    permutations=self.permutations)
+
+    @staticmethod
+    def get_many(ids, fields = None):
+        """Read many DeckModels at once, without decoding them. See
+        :meth:`DatabaseDeckStore.get_many`."""
+        return deck_store.get_many(ids, fields=fields)
+
+    @classmethod
+    def encode(cls, deck):
+        """Build an unsaved DeckModel for a Deck"""
+        pile_directory, pile_data = encoders.pack_pile(deck.pile)
+        return cls(
+            card_data=encoders.pack_ordinals(deck.ordinals),
+            pile_directory=pile_directory,
+            pile_data=pile_data,
+            count=deck.count
+        )
 
     @classmethod
     def create_deck(cls, *args, **kwargs):
         deck = Deck(*args, **kwargs)
-        encoded_deck = deck.encode()
-        deck.deck_model = cls.objects.create(
-            cards=encoded_deck['cards'],
-            pile=encoded_deck['pile'],
-            count=encoded_deck['count']
-        )
+        deck.deck_model = cls.encode(deck)
+        deck.deck_model.save(force_insert=True)
+        deck_store.add(deck.deck_model)
+        deck._mark_saved()
+        deck._cache()
         return deck
 
+    @classmethod
+    def create_decks(cls, decks, batch_size = BULK_BATCH_SIZE, seed = None,
+                     **kwargs):
+        """Create many Decks at once
+
+        Args:
+            decks (int): The number of Decks to create
+
+        Keyword Args:
+            batch_size (int): The most Decks to insert in one query
+
+            seed (int or None): Seed the first Deck's shuffler. The Decks
+            after it are seeded with seed + 1, seed + 2 and so on, so they
+            are shuffled differently but reproducibly.
+
+            Any other keyword arguments are passed to each :class:`Deck`.
+
+        Returns:
+            Deck list: The created Decks
+
+        The Decks are inserted with bulk_create, batch_size at a time, in one
+        transaction. They are not added to :data:`deck_cache`.
+        """
+        created = []
+
+        if seed is None:
+            # seeding a shuffler from the OS is slow; share one
+            kwargs['shuffler'] = get_shuffler(kwargs.get('shuffler'))
+
+        with transaction.atomic():
+            for start in range(0, decks, batch_size):
+                batch = [Deck(seed=None if seed is None else seed + i,
+                              **kwargs)
+                         for i in range(start, min(decks, start + batch_size))]
+                deck_models = [cls.encode(deck) for deck in batch]
+                cls.objects.bulk_create(deck_models)
+
+                for deck, deck_model in zip(batch, deck_models):
+                    deck_model._state.adding = False
+                    deck.deck_model = deck_model
+                    deck_store.add(deck_model)
+                    deck._mark_saved()
+
+                created.extend(batch)
+
+        return created
+
 
 class Pile(object):
+    """Pile: Named Piles of Discarded Cards
+
+    Each named pile is stored as an array of card ordinals, from the bottom
+    of the pile to the top, so pushing and drawing cost O(1) per card and
+    counting a pile is O(1).
+    """
 
     DEFAULT_PILE = "discard"
 
-    def __init__(self, piles = None):
-        self.piles = piles or {self.DEFAULT_PILE: []}
+    def __init__(self, piles = None, packed = None, ordinals = None):
+        """Initialize a Pile: Pile(piles, packed, ordinals)
+
+        Keyword Args:
+            piles (dict or None): The named piles, as lists of Cards from the
+            bottom of each pile to the top
+
+            packed (tuple or None): A pile directory and data, as returned by
+            :func:`deck.encoders.pack_pile`. They are unpacked the first time
+            the piles are used.
+
+            ordinals (dict or None): The named piles, as arrays of card
+            ordinals. The arrays are used, not copied. This takes precedence
+            over piles and packed.
+        """
+        if ordinals is not None:
+            self._ordinals = ordinals
+        elif packed is not None and not piles:
+            self._packed = packed
+        else:
+            self._ordinals = dict(
+                (name, array('B', [card.ordinal for card in cards]))
+                for name, cards in (piles or {self.DEFAULT_PILE: []}).items())
+
+        self._changed = packed is None and ordinals is None
+
+    def __getattr__(self, name):
+        """Unpack the packed piles the first time they are used"""
+        if name == '_ordinals' and '_packed' in self.__dict__:
+            self._ordinals = encoders.unpack_pile_ordinals(
+                *self.__dict__.pop('_packed'))
+            return self._ordinals
+        raise AttributeError(name)
+
+    @property
+    def piles(self):
+        """
+        Returns:
+            dict: The named piles, as lists of Cards from the bottom of each
+            pile to the top
+
+        New lists are built on every access; mutating them does not change
+        the Pile. Note that this is a property.
+        """
+        return dict((name, list(map(CARDS.__getitem__, ordinals)))
+                    for name, ordinals in self._ordinals.items())
+
+    @property
+    def ordinals(self):
+        """
+        Returns:
+            dict: The named piles, as arrays of card ordinals
+
+        These are the Pile's underlying storage rather than copies, so treat
+        them as read only. Note that this is a property.
+        """
+        return self._ordinals
 
     def count(self, pile = None):
         if not pile:
             pile = self.DEFAULT_PILE
-        the_pile = self.piles[pile]
-        return len(the_pile)
+        return len(self._ordinals[pile])
+
+    def counts(self):
+        """
+        Returns:
+            dict: The number of cards in each pile, by name
+        """
+        return dict((name, len(ordinals))
+                    for name, ordinals in self._ordinals.items())
 
     def push(self, card, into = None):
-        try:
-            pile = self.piles[into]
-        except KeyError:
+        """Put a Card, or a list of Cards, on top of a pile
+
+        Keyword Args:
+            into (hashable or None): The name of the pile, which is created
+            if it does not exist. Defaults to :attr:`DEFAULT_PILE`.
+
+        Raises:
+            Exception if the pile cannot be created, or if anything but
+            Cards is pushed. Nothing is pushed if any of the Cards is not a
+            Card.
+        """
+        if isinstance(card, Card):
+            ordinals = array('B', [card.ordinal])
+        else:
             try:
-                if not into:
-                    pile = self.piles[self.DEFAULT_PILE]
-                else:
-                    self.piles[into] = pile = []
-            except:
-                raise Exception("Could not a create pile with that name.")
+                cards = list(card)
+            except TypeError:
+                raise Exception("You may only discard a Card or a list of Cards")
 
-        try:
-            if all([isinstance(c, Card) for c in card]):
-                for c in card:
-                    pile.append(c)
-            else:
+            if not all(map(isinstance, cards, [Card] * len(cards))):
                 raise Exception("There is a non-card in this pile")
+
+            ordinals = array('B', [c.ordinal for c in cards])
+
+        into = into or self.DEFAULT_PILE
+
+        try:
+            pile = self._ordinals[into]
+        except KeyError:
+            pile = self._ordinals[into] = array('B')
         except TypeError:
-            if isinstance(card, Card):
-                pile.append(card)
-            else:
-                raise Exception("You may only discard a Card or a list of Cards")
+            raise Exception("Could not a create pile with that name.")
+
+        pile.extend(ordinals)
+        self._changed = True
 
     def draw(self, n = 1, from_pile = None):
+        """Remove Cards from the top of a pile
+
+        Keyword Args:
+            n (int): The number of Cards to draw
+
+            from_pile (hashable or None): The name of the pile. Defaults to
+            :attr:`DEFAULT_PILE`.
+
+        Returns:
+            Card list: The drawn Cards, from the top of the pile down
+
+        Raises:
+            Exception if the pile does not exist
+
+            NotEnoughCardsException if the pile has fewer than n Cards
+        """
         from_pile = from_pile or self.DEFAULT_PILE
 
         try:
-            pile = self.piles[from_pile]
+            pile = self._ordinals[from_pile]
         except KeyError:
             raise Exception("You cannot draw from a pile that does not exist.")
 
@@ -472,18 +1357,29 @@ class Pile(object):
         if not (pile_count > 0) or (n > pile_count):
             raise NotEnoughCardsException("You're trying to draw more cards"
                                           " than are in the deck!")
+        elif n <= 0:
+            return []
         else:
-            cards = []
-            pool = pile[:]
+            ordinals = pile[pile_count - n:]
+            del pile[pile_count - n:]
+            self._changed = True
 
-            while n > 0:
-                cards.append(pool.pop())
-                n -= 1
-
-            return cards
+            ordinals.reverse()
+            return list(map(CARDS.__getitem__, ordinals))
 
     def show(self, pile = None):
-        return self.piles.get(pile, self.piles[self.DEFAULT_PILE])
+        ordinals = self._ordinals.get(pile, self._ordinals[self.DEFAULT_PILE])
+        return list(map(CARDS.__getitem__, ordinals))
+
+    def __copy__(self):
+        pile = Pile.__new__(Pile)
+        pile.__dict__.update(self.__dict__)
+
+        if '_ordinals' in self.__dict__:
+            pile._ordinals = dict((name, ordinals[:])
+                                  for name, ordinals in self._ordinals.items())
+
+        return pile
 
     def __repr__(self):
         return 'Pile with ' + str(self.piles)
@@ -500,3 +1396,418 @@ class Pile(object):
                 for card in cards:
                     string += "\t* " + str(card) + "\n"
         return string
+
+
+class DatabaseDeckStore(object):
+    """DatabaseDeckStore: Where Saved Decks Live
+
+    A deck store reads, writes and deletes the stored form of Decks, their
+    DeckModels, for :class:`Deck`. This one keeps them in the database
+    only.
+    """
+
+    def get(self, id, lock = False):
+        """Read a DeckModel
+
+        Args:
+            id (str): A UUID associated with a saved Deck
+
+        Keyword Args:
+            lock (bool): Lock the DeckModel's row with SELECT ... FOR UPDATE
+            until the end of the current transaction
+
+        Returns:
+            DeckModel: The DeckModel
+
+        Raises:
+            NoSuchDeckException if the Deck does not exist
+        """
+        queryset = DeckModel.objects
+        if lock:
+            queryset = queryset.select_for_update()
+
+        try:
+            return queryset.get(pk=id)
+        except Exception:
+            raise NoSuchDeckException("No Such Deck Exists")
+
+    def get_version(self, id):
+        """Read the version of a DeckModel, and nothing else
+
+        Args:
+            id (str): A UUID associated with a saved Deck
+
+        Returns:
+            int or None: The version, or None if the Deck does not exist
+        """
+        versions = DeckModel.objects.filter(pk=id).values_list('version',
+                                                               flat=True)
+        return next(iter(versions), None)
+
+    def get_many(self, ids, fields = None):
+        """Read many DeckModels in one query
+
+        Args:
+            ids (list of UUID): The ids of the DeckModels
+
+        Keyword Args:
+            fields (tuple of str or None): Only read these fields. Any others
+            are read if they are used.
+
+        Returns:
+            dict: The DeckModels by id. Decks which do not exist are left out.
+        """
+        queryset = DeckModel.objects.all()
+        if fields:
+            queryset = queryset.only(*fields)
+        return queryset.in_bulk(ids)
+
+    def add(self, deck_model):
+        """Store a DeckModel which has just been created"""
+        pass
+
+    def save(self, deck_model, fields):
+        """Save some of a DeckModel's fields
+
+        Raises:
+            ConcurrentModificationException if the DeckModel was saved since
+            it was read. See :meth:`DeckModel.save_fields`.
+        """
+        deck_model.save_fields(fields)
+
+    def delete(self, deck_model):
+        deck_model.delete()
+
+    def commit(self):
+        """Publish the saves made in this thread's transaction, once it has
+        committed. Called by :meth:`Deck.modify`."""
+        pass
+
+    def rollback(self):
+        """Forget the saves made in this thread's transaction, once it has
+        been rolled back. Called by :meth:`Deck.modify`."""
+        pass
+
+    def flush(self):
+        """Write the saves which have only been stored in a cache to the
+        database. See ``manage.py flush_decks``.
+
+        Returns:
+            int: The number of Decks written
+        """
+        return 0
+
+
+class CacheDeckStore(DatabaseDeckStore):
+    """CacheDeckStore: Saved Decks Shared Through Django's Cache
+
+    Keeps the compact stored form of Decks in one of Django's caches as well
+    as the database, so that processes sharing the cache (memcached, Redis,
+    or the filesystem) share hot Decks. Decks which are not in the cache are
+    read from the database and added to it.
+
+    By default every save is written to the database, then to the cache.
+    With write_behind, saves are only written to the cache, and a Deck's
+    row is brought up to date when it is saved write_behind seconds or
+    more after its row was last written, or by :meth:`flush`, which
+    ``manage.py flush_decks`` runs. Decks with changes which have not been
+    written to the database yet do not expire from the cache, but the
+    changes are lost if the cache evicts them to make room, so run
+    ``manage.py flush_decks --interval`` alongside the workers. Saves are
+    checked against the version in the cache instead of the database, and
+    locking a Deck's row has no effect. Write-behind relies on the cache's
+    add being atomic, which the filesystem cache's is not.
+
+    Saves made inside a transaction only reach the cache when
+    :meth:`commit` is called once it has committed, so a save which is
+    rolled back is never shared. Until then a write-through save removes
+    the Deck from the cache, and a write-behind save keeps the Deck locked
+    against other saves. :meth:`Deck.modify` calls :meth:`commit` and
+    :meth:`rollback`; code which saves Decks in transactions of its own
+    must call them too.
+    """
+
+    FIELDS = ('card_data', 'count', 'pile_directory', 'pile_data',
+              'permutations', 'version')
+
+    def __init__(self, cache = 'default', timeout = None,
+                 write_behind = None, key_prefix = 'deck',
+                 clock = time.time):
+        """Initialize a CacheDeckStore
+
+        Keyword Args:
+            cache (str): The alias of the cache in the CACHES setting
+
+            timeout (int or None): How many seconds Decks stay in the cache.
+            None uses the cache's default timeout.
+
+            write_behind (float or None): How many seconds a Deck's row may
+            fall behind the cache. None writes every save to the database.
+
+            key_prefix (str): Prepended to the cache keys
+
+            clock (callable): Returns the current time in seconds
+        """
+        self.cache = caches[cache]
+        if write_behind is not None and isinstance(self.cache, FileBasedCache):
+            raise ImproperlyConfigured("The filesystem cache cannot be used "
+                                       "for write-behind deck stores.")
+
+        self.timeout = timeout
+        self.write_behind = write_behind
+        self.key_prefix = key_prefix
+        self.clock = clock
+        self._local = threading.local()
+
+    def _key(self, id):
+        return "{}:{}".format(self.key_prefix, id)
+
+    def _dirty_key(self):
+        return "{}:dirty".format(self.key_prefix)
+
+    def _dumps(self, deck_model, written_at, row_version = None):
+        state = dict((field, getattr(deck_model, field))
+                     for field in self.FIELDS)
+        state['card_data'] = bytes(deck_model.card_data[:deck_model.count])
+        state['pile_data'] = bytes(deck_model.pile_data)
+        state['written_at'] = written_at
+        # the version of the Deck's row, which is behind the cache until
+        # the row is written
+        state['row_version'] = (deck_model.version if row_version is None
+                                else row_version)
+        return state
+
+    def _loads(self, id, state):
+        deck_model = DeckModel(id=id, **dict((field, state[field])
+                                             for field in self.FIELDS))
+        deck_model._state.adding = False
+        return deck_model
+
+    def _timeout(self):
+        return {} if self.timeout is None else {'timeout': self.timeout}
+
+    def _set(self, deck_model, written_at, row_version = None):
+        state = self._dumps(deck_model, written_at, row_version)
+        if state['row_version'] != state['version']:
+            # changes which are only in the cache must not expire
+            self.cache.set(self._key(deck_model.id), state, None)
+        else:
+            self.cache.set(self._key(deck_model.id), state,
+                           **self._timeout())
+
+    def _set_dirty(self, id, dirty):
+        """Add a Deck to or remove it from the ids of the Decks whose rows
+        have fallen behind the cache"""
+        key = self._dirty_key()
+        self._lock(key)
+        try:
+            ids = self.cache.get(key, set())
+            if dirty:
+                ids.add(str(id))
+            else:
+                ids.discard(str(id))
+            self.cache.set(key, ids, None)
+        finally:
+            self._unlock(key)
+
+    def _write_row(self, deck_model, row_version):
+        """Bring a Deck's row up to date with the cache
+
+        Raises:
+            ConcurrentModificationException if the row was deleted, or saved
+            while the Deck was not cached. The Deck is removed from the
+            cache.
+        """
+        values = dict((field, getattr(deck_model, field))
+                      for field in self.FIELDS)
+        updated = DeckModel.objects.filter(
+            pk=deck_model.pk, version=row_version).update(**values)
+
+        if not updated:
+            self.cache.delete(self._key(deck_model.id))
+            raise ConcurrentModificationException("The Deck was modified by "
+                                                  "another request.")
+
+    def _in_transaction(self):
+        return transaction.get_connection().in_atomic_block
+
+    def _pending(self):
+        """The saves made in this thread's current transaction, by key"""
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = {}
+        return self._local.pending
+
+    def _lock(self, key):
+        # cache.add is atomic, so it serializes saves of a Deck across
+        # processes while the version is compared
+        for attempt in range(100):
+            if self.cache.add(key + ':lock', True, 5):
+                return
+            time.sleep(0.001)
+
+        raise ConcurrentModificationException("The Deck was modified by "
+                                              "another request.")
+
+    def _unlock(self, key):
+        self.cache.delete(key + ':lock')
+
+    def get(self, id, lock = False):
+        if self.write_behind is not None or not lock:
+            state = self.cache.get(self._key(id))
+            if state is not None:
+                return self._loads(id, state)
+
+        deck_model = super(CacheDeckStore, self).get(id, lock=lock)
+        self.cache.add(self._key(deck_model.id),
+                       self._dumps(deck_model, self.clock()),
+                       **self._timeout())
+        return deck_model
+
+    def get_version(self, id):
+        state = self.cache.get(self._key(id))
+        if state is not None:
+            return state['version']
+        return super(CacheDeckStore, self).get_version(id)
+
+    def get_many(self, ids, fields = None):
+        states = self.cache.get_many([self._key(id) for id in ids])
+        deck_models, missing = {}, []
+
+        for id in ids:
+            state = states.get(self._key(id))
+            if state is None:
+                missing.append(id)
+            else:
+                deck_models[id] = self._loads(id, state)
+
+        if missing:
+            deck_models.update(super(CacheDeckStore, self).get_many(
+                missing, fields=fields))
+        return deck_models
+
+    def add(self, deck_model):
+        # Decks created in a transaction are cached when they are first read
+        if not self._in_transaction():
+            self._set(deck_model, self.clock())
+
+    def save(self, deck_model, fields):
+        if self.write_behind is None:
+            key = self._key(deck_model.id)
+            try:
+                super(CacheDeckStore, self).save(deck_model, fields)
+            except ConcurrentModificationException:
+                self.cache.delete(key)
+                raise
+
+            if self._in_transaction():
+                self.cache.delete(key)
+                self._pending()[key] = (deck_model, self.clock(), None,
+                                        False)
+            else:
+                self._set(deck_model, self.clock())
+        else:
+            self._save_behind(deck_model, fields)
+
+    def _save_behind(self, deck_model, fields):
+        key = self._key(deck_model.id)
+        self._lock(key)
+        locked = True
+
+        try:
+            state = self.cache.get(key)
+            if state is None:
+                # evicted: the database has to check the version
+                super(CacheDeckStore, self).save(deck_model, fields)
+                written_at, row_version = self.clock(), None
+            else:
+                if state['version'] != deck_model.version:
+                    raise ConcurrentModificationException(
+                        "The Deck was modified by another request.")
+
+                deck_model.version += 1
+                now, written_at = self.clock(), state['written_at']
+                row_version = state['row_version']
+
+                if now - written_at >= self.write_behind:
+                    self._write_row(deck_model, row_version)
+                    written_at, row_version = now, None
+                elif row_version == state['version']:
+                    self._set_dirty(deck_model.id, True)
+
+            if self._in_transaction():
+                # the Deck stays locked, and other requests keep reading the
+                # state it was saved in before, until the transaction ends
+                self._pending()[key] = (deck_model, written_at, row_version,
+                                        True)
+                locked = False
+            else:
+                self._set(deck_model, written_at, row_version)
+        finally:
+            if locked:
+                self._unlock(key)
+
+    def commit(self):
+        if self._in_transaction():
+            return
+
+        pending, self._local.pending = self._pending(), {}
+        for key, (deck_model, written_at, row_version,
+                  locked) in pending.items():
+            self._set(deck_model, written_at, row_version)
+            if locked:
+                self._unlock(key)
+
+    def rollback(self):
+        pending, self._local.pending = self._pending(), {}
+        for key, (deck_model, written_at, row_version,
+                  locked) in pending.items():
+            if locked:
+                self._unlock(key)
+
+    def flush(self):
+        if self.write_behind is None:
+            return 0
+
+        written = 0
+        for id in self.cache.get(self._dirty_key(), ()):
+            key = self._key(id)
+            try:
+                self._lock(key)
+            except ConcurrentModificationException:
+                # the Deck is being saved; the next flush writes it
+                continue
+
+            try:
+                state = self.cache.get(key)
+                if state is not None and \
+                        state['row_version'] != state['version']:
+                    deck_model = self._loads(id, state)
+                    try:
+                        self._write_row(deck_model, state['row_version'])
+                    except ConcurrentModificationException:
+                        pass
+                    else:
+                        self._set(deck_model, self.clock())
+                        written += 1
+
+                self._set_dirty(id, False)
+            finally:
+                self._unlock(key)
+
+        return written
+
+    def delete(self, deck_model):
+        self.cache.delete(self._key(deck_model.id))
+        super(CacheDeckStore, self).delete(deck_model)
+
+
+def _from_settings(setting):
+    return dict((option.lower(), value) for option, value in setting.items())
+
+
+#: The process's cache of decoded Decks. See :mod:`deck.cache`.
+deck_cache = DeckCache(**_from_settings(settings.DECK_CACHE))
+
+#: Where saved Decks live. See :class:`DatabaseDeckStore`.
+deck_store = import_string(settings.DECK_STORE['BACKEND'])(
+    **_from_settings(settings.DECK_STORE.get('OPTIONS', {})))
@@ -5,6 +5,8 @@ from models import DeckModel, Card
 
 class DeckModelSerializer(serializers.ModelSerializer):
 
+    pile = serializers.DictField(read_only=True)
+
     class Meta:
         model = DeckModel
         fields = ('id', 'count', 'pile')
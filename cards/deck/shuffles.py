@@ -0,0 +1,289 @@
+"""
+.. module:: deck.shuffles
+   :synopsis: Interchangeable strategies for shuffling a Deck's cards.
+
+Every Deck shuffles its cards with a :class:`Shuffler`. A Shuffler owns its
+own random number generator, so decks never share state with the module
+level generator in :mod:`random`, and a seeded Shuffler always produces the
+same sequence of shuffles.
+
+Lighter reshuffles -- cuts, riffles and shuffling only the top of a deck --
+are described by small permutation descriptors, such as ``["riffle", 2,
+1234]``, which :func:`permute` applies to an array of card ordinals. A
+descriptor carries everything needed to replay it, including the seed of its
+randomness, so a Deck can store descriptors in place of a reordered list of
+cards.
+
+"""
+
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Shuffler(object):
+    """Shuffler: Base Class for Shuffling Strategies
+
+    Subclasses implement :func:`shuffle`, which permutes an array of card
+    ordinals in place, and :func:`seed`, which resets the generator.
+    """
+
+    name = None
+
+    def __init__(self, seed = None):
+        self.seed(seed)
+
+    def seed(self, seed = None):
+        raise NotImplementedError
+
+    def shuffle(self, ordinals):
+        raise NotImplementedError
+
+    def random_seed(self):
+        """Draw a 32 bit seed from this Shuffler's generator"""
+        return self.random.getrandbits(32)
+
+    def __repr__(self):
+        return "{} shuffler".format(self.name)
+
+
+class FisherYatesShuffler(Shuffler):
+    """Shuffle with a Fisher-Yates shuffle over a private Mersenne Twister
+
+    This is the same algorithm as random.shuffle, run on a random.Random that
+    belongs to this Shuffler alone.
+    """
+
+    name = "fisher-yates"
+
+    def seed(self, seed = None):
+        self.random = random.Random(seed)
+
+    def shuffle(self, ordinals):
+        self.random.shuffle(ordinals)
+
+
+class NumpyShuffler(Shuffler):
+    """Shuffle with NumPy's vectorized permutations
+
+    Uses a numpy.random.Generator where NumPy provides one, and a
+    numpy.random.RandomState on older versions. This is the fastest strategy
+    for large shoes. Requires NumPy.
+    """
+
+    name = "numpy"
+
+    def seed(self, seed = None):
+        if numpy is None:
+            raise Exception("The numpy shuffler requires NumPy.")
+
+        default_rng = getattr(numpy.random, 'default_rng', None)
+        if default_rng is not None:
+            self.random = default_rng(seed)
+        else:
+            self.random = numpy.random.RandomState(seed)
+
+    def shuffle(self, ordinals):
+        if len(ordinals) > 1:
+            self.random.shuffle(numpy.frombuffer(ordinals, dtype=numpy.uint8))
+
+    def random_seed(self):
+        if hasattr(self.random, 'integers'):
+            return int(self.random.integers(2 ** 32))
+        return int(self.random.randint(2 ** 32))
+
+
+class SystemRandomShuffler(Shuffler):
+    """Shuffle with a cryptographically secure generator
+
+    Draws its randomness from the operating system through random.SystemRandom,
+    so shuffles cannot be predicted, nor reproduced: this Shuffler cannot be
+    seeded.
+    """
+
+    name = "system"
+
+    def seed(self, seed = None):
+        if seed is not None:
+            raise Exception("The system shuffler cannot be seeded.")
+        self.random = random.SystemRandom()
+
+    def shuffle(self, ordinals):
+        self.random.shuffle(ordinals)
+
+
+SHUFFLERS = dict((shuffler.name, shuffler) for shuffler in
+                 (FisherYatesShuffler, NumpyShuffler, SystemRandomShuffler))
+
+DEFAULT_SHUFFLER = "numpy" if numpy is not None else "fisher-yates"
+
+
+def get_shuffler(shuffler = None, seed = None):
+    """Get a Shuffler: get_shuffler(shuffler, seed)
+
+    Keyword Args:
+        shuffler (Shuffler or str or None): A Shuffler, which is returned as
+        it is, or the name of a strategy: "fisher-yates", "numpy" or
+        "system". Defaults to "numpy" when NumPy is installed, and to
+        "fisher-yates" otherwise.
+
+        seed (int or None): Seed the new Shuffler's generator
+
+    Returns:
+        Shuffler: A Shuffler
+
+    Raises:
+        Exception if there is no strategy with that name
+    """
+    if isinstance(shuffler, Shuffler):
+        if seed is not None:
+            shuffler.seed(seed)
+        return shuffler
+
+    try:
+        strategy = SHUFFLERS[shuffler or DEFAULT_SHUFFLER]
+    except KeyError:
+        raise Exception("No such shuffler: {}".format(shuffler))
+    return strategy(seed=seed)
+
+
+def binomial(rng, n):
+    """The number of heads in n fair coin flips"""
+    if n < 1:
+        return 0
+    return bin(rng.getrandbits(n)).count('1')
+
+
+def cut(ordinals, at):
+    """Cut a deck, moving its top cards to the bottom
+
+    Args:
+        ordinals (array): Card ordinals, from the bottom of the deck to the top
+        at (int): The number of cards to move from the top to the bottom
+    """
+    split = len(ordinals) - at
+    ordinals[:] = ordinals[split:] + ordinals[:split]
+
+
+def riffle(ordinals, rng, passes = 1):
+    """Riffle shuffle a deck
+
+    Args:
+        ordinals (array): Card ordinals, from the bottom of the deck to the top
+        rng (random.Random): The source of randomness
+
+    Keyword Args:
+        passes (int): The number of riffles
+
+    Each pass follows the Gilbert-Shannon-Reeds model: the deck is cut into
+    two packets at a binomially distributed point, and the packets are
+    interleaved by dropping cards from the bottom of one or the other with
+    probability proportional to the packets' sizes.
+    """
+    uniform = rng.random
+
+    for i in range(passes):
+        size = len(ordinals)
+        split = binomial(rng, size)
+        left, right = ordinals[:split].tolist(), ordinals[split:].tolist()
+        riffled = []
+        append = riffled.append
+        l = r = 0
+
+        # one draw per card, so the loop only touches locals and lists
+        while l < split and r < size - split:
+            remaining_left = split - l
+            if uniform() * (remaining_left + size - split - r) < \
+                    remaining_left:
+                append(left[l])
+                l += 1
+            else:
+                append(right[r])
+                r += 1
+
+        riffled.extend(left[l:])
+        riffled.extend(right[r:])
+        ordinals[:] = type(ordinals)(ordinals.typecode, riffled)
+
+
+def shuffle_top(ordinals, n, rng):
+    """Shuffle only the top n cards of a deck
+
+    Args:
+        ordinals (array): Card ordinals, from the bottom of the deck to the top
+        n (int): The number of cards to shuffle
+        rng (random.Random): The source of randomness
+    """
+    split = len(ordinals) - n
+    top = ordinals[split:]
+    rng.shuffle(top)
+    ordinals[split:] = top
+
+
+# The most random keys generated at once by random_orders
+MAX_KEYS = 1 << 20
+
+
+def random_orders(rng, rows, size, k = None):
+    """Shuffle many rows at once by sorting matrices of random keys
+
+    Args:
+        rng (numpy.random.RandomState): The source of randomness
+        rows (int): The number of rows to shuffle
+        size (int): The number of positions in each row
+
+    Keyword Args:
+        k (int or None): Only return the first k positions of each row's
+        order, which only needs the k lowest keys of each row sorted
+
+    Returns:
+        generator: (rows, k or size) arrays of positions, a random order of
+        range(size) for each row, for at most :data:`MAX_KEYS` keys at a
+        time. Requires NumPy.
+    """
+    chunk = max(1, MAX_KEYS // max(size, 1))
+
+    for start in range(0, rows, chunk):
+        keys = rng.random_sample((min(chunk, rows - start), size))
+
+        if k is not None and k < size:
+            indices = numpy.arange(len(keys))[:, None]
+            order = numpy.argpartition(keys, k - 1, axis=1)[:, :k]
+            yield order[indices, numpy.argsort(keys[indices, order], axis=1)]
+        else:
+            yield numpy.argsort(keys, axis=1)
+
+
+def permute(ordinals, descriptor):
+    """Apply a permutation descriptor to a deck
+
+    Args:
+        ordinals (array): Card ordinals, from the bottom of the deck to the top
+        descriptor (list): One of ``["cut", at]``, ``["riffle", passes,
+        seed]`` or ``["top", n, seed]``
+
+    Raises:
+        Exception if the descriptor is not understood
+
+    Replaying the same descriptor on the same cards always gives the same
+    order, whatever Shuffler produced it.
+    """
+    try:
+        operation, arguments = descriptor[0], descriptor[1:]
+
+        if operation == "cut":
+            at, = arguments
+            cut(ordinals, at)
+        elif operation == "riffle":
+            passes, seed = arguments
+            riffle(ordinals, random.Random(seed), passes=passes)
+        elif operation == "top":
+            n, seed = arguments
+            shuffle_top(ordinals, n, random.Random(seed))
+        else:
+            raise ValueError(operation)
+    except (IndexError, TypeError, ValueError):
+        raise Exception("Invalid permutation: {}".format(descriptor))
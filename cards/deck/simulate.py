@@ -0,0 +1,146 @@
+"""
+.. module:: deck.simulate
+   :synopsis: Monte Carlo estimates over shuffled decks.
+
+:func:`run` deals a shuffled shoe many times, calls a trial function on
+each deal, and counts the trial's outcomes. The deals are made in batches of
+card ordinals, never Decks or Cards: with NumPy, each batch shuffles all of
+its shoes at once by sorting a matrix of random keys, and without it each
+deal is a :func:`random.sample` of the shoe.
+
+Batches are spread across a :class:`concurrent.futures.ProcessPoolExecutor`.
+Every batch has its own seed, drawn up front from the seed of the run, so a
+seeded run gives the same counts however many workers it uses. Each worker
+returns the counts of its batch, and they are added up as the batches
+finish.
+
+    >>> from deck import evaluate, simulate
+    >>> def flush(ordinals):
+    ...     return evaluate.poker_rank(ordinals) >> 20 >= evaluate.FLUSH
+    >>> counts = simulate.run(flush, trials=100000, deal=5, seed=1)
+    >>> simulate.probability(counts, True)
+
+Trial functions are sent to the workers by pickling, so they must be
+defined at the top level of a module.
+
+"""
+
+import collections
+import random
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .shuffles import random_orders
+
+
+BATCH_SIZE = 4096
+
+
+def deal_batch(n, deal, size, seed = None):
+    """Deal the top cards of size freshly shuffled shoes
+
+    Args:
+        n (int): The number of 52 card decks in each shoe
+
+        deal (int): The number of cards to deal from each shoe
+
+        size (int): The number of shoes
+
+    Keyword Args:
+        seed (int or None): Seed the batch's generator
+
+    Returns:
+        list: A list of card ordinals for each shoe, from the top of the
+        shoe down
+    """
+    cards = 52 * n
+    if not 0 < deal <= cards:
+        raise Exception("You may deal between 1 and {} cards.".format(cards))
+
+    if numpy is None:
+        rng = random.Random(seed)
+        shoe = array('B', range(52)) * n
+        return [rng.sample(shoe, deal) for _ in range(size)]
+
+    # each shoe is shuffled by sorting a row of random keys, and the
+    # positions of the lowest keys are dealt. Position p in a fresh shoe
+    # holds the card with ordinal p % 52.
+    rng = numpy.random.RandomState(seed)
+    deals = []
+
+    for order in random_orders(rng, size, cards, k=deal):
+        deals.extend((order % 52).astype(numpy.uint8).tolist())
+
+    return deals
+
+
+def run_batch(trial, n, deal, size, seed = None):
+    """Deal a batch and count the outcomes of trial on each deal
+
+    Returns:
+        Counter: The number of deals with each outcome
+    """
+    return collections.Counter(map(trial, deal_batch(n, deal, size, seed)))
+
+
+def run(trial, trials, n = 1, deal = 52, batch_size = BATCH_SIZE,
+        workers = None, seed = None):
+    """Count the outcomes of trial on many shuffled deals
+
+    Args:
+        trial (callable): Takes the card ordinals dealt from one shuffled
+        shoe, from the top down, and returns a hashable outcome
+
+        trials (int): The number of deals
+
+    Keyword Args:
+        n (int): The number of 52 card decks in the shoe
+
+        deal (int): The number of cards dealt from the top of the shoe for
+        each trial
+
+        batch_size (int): The number of deals in each batch
+
+        workers (int or None): The number of worker processes. 0 runs every
+        batch in this process. None uses one worker per CPU.
+
+        seed (int or None): Seed the run, so that its counts can be
+        reproduced
+
+    Returns:
+        Counter: The number of deals with each outcome
+    """
+    rng = random.Random(seed)
+    batches = [(min(batch_size, trials - start), rng.getrandbits(32))
+               for start in range(0, trials, batch_size)]
+    counts = collections.Counter()
+
+    if workers == 0:
+        for size, batch_seed in batches:
+            counts.update(run_batch(trial, n, deal, size, batch_seed))
+        return counts
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_batch, trial, n, deal, size,
+                                   batch_seed)
+                   for size, batch_seed in batches]
+        for future in as_completed(futures):
+            counts.update(future.result())
+
+    return counts
+
+
+def probability(counts, outcome):
+    """
+    Returns:
+        float: The fraction of the trials counted in counts, as returned
+        by :func:`run`, with an outcome
+    """
+    total = sum(counts.values())
+    return float(counts[outcome]) / total if total else 0.0
@@ -1,9 +1,30 @@
-from django.test import TestCase
+import copy
+import itertools
+import json
+import pickle
+import random
+import threading
+import unittest
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 
 from .encoders import decode_deck, decode_pile, decode_card, \
-                      encode_deck, encode_pile, encode_card
+                      encode_deck, encode_pile, encode_card, \
+                      dumps_deck, dumps_deck_model, DeckEncoder, \
+                      JSONBytes, dumps_packed_pile, dumps_pile, iter_deck, \
+                      iter_deck_model, iter_ordinals, iter_pile, \
+                      pack_pile, unpack_pile
 
-from .models import Card, Deck, DeckModel, Pile
+from . import batch, evaluate, models, shuffles, simulate
+from .cache import DeckCache
+from .exceptions import ConcurrentModificationException, DecodeException, \
+                        NotEnoughCardsException, NoSuchDeckException
+from .models import CARDS, CacheDeckStore, Card, Deck, DeckModel, Pile, \
+                    deck_cache
 
 
 class TestCard(TestCase):
@@ -63,6 +84,63 @@ class TestCard(TestCase):
         self.assertEqual(self.ace_of_spades, ace_of_spades)
         self.assertNotEqual(self.ace_of_spades, ten_of_diamonds)
 
+    def test_interning(self):
+        # there is only ever one instance of each card
+        self.assertIs(Card("Ace", "Spades"), self.ace_of_spades)
+        self.assertIs(Card.from_ordinal(self.ace_of_spades.ordinal),
+                      self.ace_of_spades)
+        self.assertEqual(len(set(Card.from_ordinal(i) for i in range(52))), 52)
+        self.assertRaises(Exception, Card.from_ordinal, 52)
+        self.assertRaises(Exception, Card, 11, "Spades")
+
+        # decoded cards and the cards of a new deck are shared instances
+        decoded_card = decode_card({'rank': "Ace", 'suit': "Spades"})
+        self.assertIs(decoded_card, self.ace_of_spades)
+        self.assertIn(self.ace_of_spades,
+                      [card for card in Deck(2) if card is self.ace_of_spades])
+
+    def test_immutability(self):
+        with self.assertRaises(AttributeError):
+            self.ace_of_spades.rank = 2
+        with self.assertRaises(AttributeError):
+            self.ace_of_spades.foo = "bar"
+        self.assertIs(pickle.loads(pickle.dumps(self.ace_of_spades)),
+                      self.ace_of_spades)
+
+    def test_total_ordering(self):
+        # cards are ordered by rank and then by suit, consistently with ==
+        five_of_hearts = Card(5, "Hearts")
+        self.assertTrue(self.five_of_clubs < five_of_hearts)
+        self.assertTrue(self.five_of_clubs <= five_of_hearts)
+        self.assertFalse(self.five_of_clubs >= five_of_hearts)
+        self.assertFalse(self.five_of_clubs > five_of_hearts)
+        self.assertTrue(five_of_hearts < Card(6, "Clubs"))
+        self.assertNotEqual(self.five_of_clubs, five_of_hearts)
+        self.assertTrue(self.five_of_clubs <= self.five_of_clubs)
+
+        cards = Deck().cards
+        for card, other in itertools.product(cards[:13], cards[::13]):
+            self.assertEqual(
+                [card < other, card == other, card > other].count(True), 1)
+
+        # against a rank only the rank is compared
+        self.assertTrue(self.five_of_clubs <= 5 and five_of_hearts >= 5)
+        self.assertTrue(self.five_of_clubs < "Jack")
+
+        # and comparing against anything else never raises from the
+        # comparison itself
+        self.assertFalse(self.five_of_clubs == "Hearts")
+        self.assertTrue(self.five_of_clubs != "Not a Card")
+        self.assertFalse(self.five_of_clubs == [])
+        self.assertTrue(self.five_of_clubs != {})
+        self.assertIs(self.five_of_clubs.__lt__([]), NotImplemented)
+
+        # sort keys order cards by rank and then by suit
+        cards = sorted(Deck().cards, key=lambda card: card.sort_key)
+        self.assertEqual(cards[0], Card(2, "Clubs"))
+        self.assertEqual(cards[-1], self.ace_of_spades)
+        self.assertEqual(sorted(Deck().cards)[-1], "Ace")
+
 
 class TestDeck(TestCase):
 
@@ -88,6 +166,63 @@ class TestDeck(TestCase):
             self.assertTrue(isinstance(decoded_cards[i], Card))
             self.assertEqual(cards[i], decoded_cards[i])
 
+    def test_ordinals(self):
+        # the deck's cards are stored as an array of one byte card ordinals
+        self.assertEqual(self.double_deck.ordinals.itemsize, 1)
+        self.assertEqual(len(self.double_deck.ordinals), 52 * 2)
+        self.assertEqual([Card.from_ordinal(o) for o in self.deck.ordinals],
+                         self.deck.cards)
+
+        # cards and ordinals are interchangeable ways to populate a deck
+        cards = [self.ace_of_spades, Card(2, "Hearts")]
+        deck = Deck(cards=cards)
+        self.assertEqual(deck.cards, cards)
+        self.assertEqual(Deck(ordinals=deck.ordinals).cards, cards)
+        self.assertEqual(deck.draw(), Card(2, "Hearts"))
+
+        # an empty array of ordinals is an empty deck, not a new one
+        self.assertFalse(Deck(ordinals=[]).has_cards())
+
+    def test_dumps(self):
+        # encoding straight to JSON matches encoding through dicts
+        self.deck.discard(self.deck.draw(3), into="my pile")
+        dumped = dumps_deck(self.deck)
+        self.assertTrue(isinstance(dumped, JSONBytes))
+        self.assertEqual(json.loads(dumped), json.loads(json.dumps(
+            encode_deck(self.deck))))
+
+        deck = DeckModel.create_deck(2)
+        decoded = json.loads(deck.dumps(fields=('id', 'count')))
+        self.assertEqual(decoded, {'id': deck.id, 'count': 104})
+        self.assertEqual(json.loads(json.dumps(deck, cls=DeckEncoder)),
+                         json.loads(deck.dumps()))
+
+    def test_iter(self):
+        # streaming in chunks writes the same JSON as encoding in one piece
+        deck = DeckModel.create_deck(3)
+        deck.discard(deck.draw(10), into="my pile")
+        deck.save()
+        deck_model = DeckModel.objects.get(pk=deck.id)
+
+        for chunk_size in (1, 7, 1024):
+            self.assertEqual(b''.join(iter_deck(deck, chunk_size=chunk_size)),
+                             dumps_deck(deck))
+            self.assertEqual(b''.join(iter_deck_model(
+                deck_model, chunk_size=chunk_size)),
+                dumps_deck_model(deck_model))
+
+        self.assertEqual(b''.join(iter_ordinals([])), b'[]')
+        self.assertEqual(b''.join(iter_deck(Deck(), fields=('id',))), b'{}')
+        chunks = list(iter_ordinals(deck.ordinals, chunk_size=50))
+        self.assertEqual(len(chunks), 2 + 3)
+
+    def test_draw_ordinals(self):
+        top = list(reversed(self.deck.ordinals[-3:]))
+        self.assertEqual(list(self.deck.draw_ordinals(3)), top)
+        self.assertEqual(self.deck.count, 49)
+        self.assertRaises(NotEnoughCardsException,
+                          self.deck.draw_ordinals, 50)
+
     def test_deck(self):
         # draw a card
         card = self.deck.draw()
@@ -144,6 +279,133 @@ class TestDeck(TestCase):
         self.deck.discard(hand)
         # self.deck.draw(from_pile="discard")
 
+    def test_find(self):
+        def scan(deck, value):
+            return next((i for i, c in enumerate(deck) if c == value), -1)
+
+        def scan_from_top(deck, value):
+            return max([i for i, c in enumerate(deck) if c == value] or [-1])
+
+        deck = Deck(3)
+        for value in [self.ace_of_spades, Card(7, "Hearts"), "Ace", 10]:
+            self.assertEqual(deck.find(value), scan(deck, value))
+            self.assertEqual(deck.find(value, from_top=True),
+                             scan_from_top(deck, value))
+
+        # the index follows the deck as cards are drawn and shuffled
+        deck.draw(52)
+        self.assertEqual(deck.find("Queen"), scan(deck, "Queen"))
+        deck.draw(till=Card("King", "Hearts"))
+        self.assertEqual(deck.find("King"), scan(deck, "King"))
+        self.assertEqual(deck.find(Card("King", "Hearts")), -1)
+        deck.shuffle()
+        self.assertEqual(deck.find(2, from_top=True), scan_from_top(deck, 2))
+        self.assertRaises(Exception, deck.find, "Hearts")
+
+    def test_lay_out(self):
+        # each card is repeated n times, in the same order as a single deck
+        shoe = Deck(3, shuffle=False).cards
+        self.assertEqual(shoe[::3], self.unshuffled_deck.cards)
+        self.assertEqual(shoe[1::3], self.unshuffled_deck.cards)
+        self.assertEqual(Deck(0).count, 0)
+
+        # shuffling a shoe permutes its cards
+        shuffled = Deck(3)
+        self.assertEqual(sorted(shuffled.ordinals),
+                         sorted(Deck(3, shuffle=False).ordinals))
+
+    def test_shufflers(self):
+        # a seeded deck can be reproduced, with any seedable strategy
+        shufflers = ["fisher-yates", "system"]
+        if shuffles.numpy is not None:
+            shufflers.append("numpy")
+
+        for name in shufflers:
+            deck = Deck(2, shuffler=name)
+            self.assertEqual(deck.shuffler.name, name)
+            self.assertEqual(sorted(deck.ordinals),
+                             sorted(self.double_deck.ordinals))
+
+            if name != "system":
+                self.assertEqual(Deck(2, shuffler=name, seed=3).cards,
+                                 Deck(2, shuffler=name, seed=3).cards)
+
+        # reseeding on shuffle is the same as seeding the deck
+        deck = Deck(shuffle=False, shuffler="fisher-yates")
+        deck.shuffle(seed=5)
+        seeded_deck = Deck(shuffle=False, shuffler="fisher-yates", seed=5)
+        seeded_deck.shuffle()
+        self.assertEqual(deck.cards, seeded_deck.cards)
+
+        self.assertRaises(Exception, Deck, shuffler="system", seed=1)
+        self.assertRaises(Exception, Deck, shuffler="bogus")
+
+    def test_partial_shuffles(self):
+        deck = self.unshuffled_deck
+        cards = deck.cards
+
+        # cuts move cards from the top of the deck to the bottom
+        deck.cut(at=10)
+        self.assertEqual(deck.permutations, [["cut", 10]])
+        self.assertEqual(deck.cards, cards[-10:] + cards[:-10])
+        self.assertEqual(deck.permutations, [])
+
+        # riffles and partial shuffles keep the same cards
+        deck.riffle(passes=3)
+        deck.shuffle(top=5)
+        self.assertEqual([d[0] for d in deck.permutations], ["riffle", "top"])
+        self.assertEqual(sorted(deck.ordinals), sorted(Deck().ordinals))
+
+        deck = Deck(shuffle=False)
+        deck.shuffle(top=5)
+        self.assertEqual(deck.cards[:-5], cards[:-5])
+        self.assertEqual(sorted(deck.cards[-5:]), sorted(cards[-5:]))
+
+        # descriptors replay the same way on the same cards
+        deck = Deck(shuffle=False)
+        deck.riffle(passes=2)
+        deck.cut()
+        replayed = Deck(shuffle=False, permutations=deck.permutations)
+        self.assertEqual(replayed.cards, deck.cards)
+
+        self.assertRaises(NotEnoughCardsException, deck.cut, at=53)
+        self.assertRaises(NotEnoughCardsException, deck.shuffle, top=53)
+        self.assertRaises(Exception, deck.riffle, passes=0)
+        self.assertRaises(Exception, deck.riffle, passes=Deck.MAX_PASSES + 1)
+        self.assertRaises(Exception, shuffles.permute, deck.ordinals,
+                          ["deal", 1])
+
+    def test_sort(self):
+        by_rank = self.double_deck.sorted_by("rank")
+        self.assertEqual(by_rank, sorted(self.double_deck.cards,
+                                         key=lambda card: card.sort_key))
+        self.assertEqual(by_rank[:2], [Card(2, "Clubs")] * 2)
+
+        by_suit = self.double_deck.sorted_by("suit", reverse=True)
+        self.assertEqual(by_suit, sorted(self.double_deck.cards,
+                                         key=lambda card: card.ordinal,
+                                         reverse=True))
+        self.assertEqual(by_suit[0], self.ace_of_spades)
+
+        # sorting the deck itself puts the highest cards on top
+        self.double_deck.sort()
+        self.assertEqual(self.double_deck.cards, by_rank)
+        self.assertEqual(self.double_deck.find(self.ace_of_spades), 52 * 2 - 2)
+        self.assertEqual(self.double_deck.draw(), self.ace_of_spades)
+        self.assertRaises(Exception, self.double_deck.sort, "color")
+
+    def test_draw_order(self):
+        # cards come off the top of the deck, which is the end of its cards
+        top = self.unshuffled_deck.cards[-3:]
+        top.reverse()
+        self.assertEqual(self.unshuffled_deck.draw(3), top)
+        self.assertEqual(self.unshuffled_deck.count, 52 - 3)
+        self.assertEqual(self.unshuffled_deck.draw(0), [])
+        self.assertEqual(self.unshuffled_deck.count, 52 - 3)
+        self.assertRaises(NotEnoughCardsException, self.unshuffled_deck.draw,
+                          52 - 2)
+        self.assertEqual(self.unshuffled_deck.count, 52 - 3)
+
 class TestDeckModel(TestCase):
 
     def setUp(self):
@@ -180,6 +442,440 @@ class TestDeckModel(TestCase):
         for card in hand:
             self.assertIn(card, deck.pile.show())
 
+    def test_save_permutations(self):
+        cards = self.deck.cards
+        self.deck.riffle()
+        self.deck.cut(at=1)
+        self.deck.save()
+
+        # the cards are stored as they were, with the descriptors beside them
+        deck_model = DeckModel.objects.get(pk=self.deck.id)
+        self.assertEqual([CARDS[o] for o in bytearray(deck_model.card_data)],
+                         cards)
+        self.assertEqual(len(deck_model.permutations), 2)
+
+        # and the reloaded deck replays them
+        deck = Deck.get(self.deck.id)
+        self.assertEqual(deck.cards, self.deck.cards)
+
+        # once they have been applied, the cards are rewritten
+        deck.draw()
+        deck.save()
+        deck_model = DeckModel.objects.get(pk=self.deck.id)
+        self.assertEqual(deck_model.permutations, [])
+        self.assertEqual(len(deck_model.card_data), 51)
+        self.assertEqual(Deck.get(self.deck.id).cards, deck.cards)
+
+    def test_create_decks(self):
+        decks = DeckModel.create_decks(5, batch_size=2, n=2, shuffle=False)
+
+        self.assertEqual(len(set(deck.id for deck in decks)), 5)
+        for deck in decks:
+            self.assertEqual(Deck.get(deck.id).cards,
+                             Deck(2, shuffle=False).cards)
+
+        # decks created in bulk can be saved like any other
+        decks[0].draw()
+        decks[0].save()
+        self.assertEqual(Deck.get(decks[0].id).count, 103)
+
+    def test_binary_storage(self):
+        self.deck.discard(self.deck.draw(n=3))
+        self.deck.discard(self.deck.draw(), into="mine")
+        self.deck.save()
+
+        # one byte per card, and a directory of the piles
+        deck_model = DeckModel.objects.get(pk=self.deck.id)
+        self.assertEqual(len(deck_model.card_data), 52)
+        self.assertEqual(deck_model.count, 48)
+        self.assertEqual(len(deck_model.pile_data), 4)
+        self.assertEqual(sorted(deck_model.pile_directory),
+                         [["discard", 3], ["mine", 1]])
+        self.assertEqual(deck_model.pile, encode_pile(self.deck.pile))
+
+        deck = deck_model.decode()
+        self.assertEqual(deck.cards, self.deck.cards)
+        self.assertEqual(deck.pile.piles, self.deck.pile.piles)
+
+        self.assertRaises(DecodeException, unpack_pile, [["mine", 2]], b'\x00')
+
+    def test_delta_save(self):
+        def saved_fields(operation):
+            deck = Deck.get(self.deck.id)
+            operation(deck)
+            with CaptureQueriesContext(connection) as queries:
+                deck.save()
+            return [[column for column in ('card_data', 'count',
+                                           'pile_directory', 'pile_data',
+                                           'permutations')
+                     if '"{}" ='.format(column) in query['sql']]
+                    for query in queries.captured_queries]
+
+        # a draw only stores the new count
+        self.assertEqual(saved_fields(lambda deck: deck.draw(n=2)),
+                         [['count']])
+        self.assertEqual(Deck.get(self.deck.id).cards, self.deck.cards[:-2])
+
+        two_of_clubs = Card(2, "Clubs")
+        self.assertEqual(saved_fields(lambda deck: deck.discard(two_of_clubs)),
+                         [['pile_directory', 'pile_data']])
+        self.assertEqual(saved_fields(lambda deck: deck.riffle()),
+                         [['permutations']])
+        self.assertEqual(saved_fields(lambda deck: deck.shuffle()),
+                         [['card_data', 'count', 'permutations']])
+        self.assertEqual(saved_fields(lambda deck: None), [])
+
+    def test_lazy_decoding(self):
+        self.deck.discard(self.deck.draw(n=2))
+        self.deck.save()
+
+        # the count, the piles and descriptor shuffles leave the cards packed
+        deck_cache.clear()
+        deck = Deck.get(self.deck.id)
+        self.assertEqual(deck.count, 50)
+        deck.dumps(fields=('id', 'count', 'pile'))
+        deck.riffle()
+        deck.save()
+        self.assertNotIn('_ordinals', deck.__dict__)
+
+        # and the cards leave the piles packed
+        deck_cache.clear()
+        deck = Deck.get(self.deck.id)
+        self.assertEqual(len(deck.cards), 50)
+        self.assertNotIn('_ordinals', deck.pile.__dict__)
+        self.assertIn('_packed', deck.pile.__dict__)
+        self.assertEqual(deck.pile.piles, self.deck.pile.piles)
+
+
+class TestDeckCache(TransactionTestCase):
+
+    def setUp(self):
+        deck_cache.clear()
+        self.deck = DeckModel.create_deck()
+
+    def test_read_through(self):
+        # created decks are cached, and each get is a copy
+        deck = Deck.get(self.deck.id)
+        self.assertEqual(deck_cache.hits, 1)
+        deck.draw(n=2)
+        self.assertEqual(Deck.get(self.deck.id).count, 52)
+
+        # saves write through, and hits only read the deck's version
+        deck.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(Deck.get(self.deck.id).cards, deck.cards)
+
+        # deletes invalidate
+        deck.delete()
+        self.assertRaises(NoSuchDeckException, Deck.get, self.deck.id)
+        self.assertEqual((deck_cache.hits, deck_cache.misses), (3, 1))
+
+    def test_pending_permutations(self):
+        # descriptors are replayed once, on the cached copy
+        deck = Deck.get(self.deck.id)
+        deck.riffle(passes=Deck.MAX_PASSES)
+        deck.cut()
+        deck.save()
+        self.assertEqual(len(DeckModel.objects.get(
+            pk=self.deck.id).permutations), 2)
+
+        cached_deck = Deck.get(self.deck.id)
+        self.assertEqual(cached_deck.permutations, [])
+        self.assertEqual(cached_deck.cards, deck.cards)
+
+        # and the next save stores the replayed cards
+        cached_deck.draw()
+        cached_deck.save()
+        deck_model = DeckModel.objects.get(pk=self.deck.id)
+        self.assertEqual(deck_model.permutations, [])
+        deck_cache.clear()
+        self.assertEqual(Deck.get(self.deck.id).cards, deck.cards[:-1])
+
+    def test_other_process(self):
+        # saves and deletes made by other processes show up in the next get
+        Deck.get(self.deck.id)
+        DeckModel.objects.filter(pk=self.deck.id).update(
+            count=40, version=F('version') + 1)
+        self.assertEqual(Deck.get(self.deck.id).count, 40)
+        self.assertEqual(deck_cache.get(self.deck.id).count, 40)
+
+        DeckModel.objects.filter(pk=self.deck.id).delete()
+        self.assertRaises(NoSuchDeckException, Deck.get, self.deck.id)
+        self.assertIsNone(deck_cache.get(self.deck.id))
+
+    def test_rollback(self):
+        # decks saved in a transaction are only cached once it commits
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                deck = Deck.get(self.deck.id)
+                deck.draw(5)
+                deck.save()
+                raise ValueError
+        self.assertIsNone(deck_cache.get(self.deck.id))
+        self.assertEqual(Deck.get(self.deck.id).count, 52)
+
+        def fail(deck):
+            deck.draw(5)
+            deck.save()
+            raise ValueError
+        self.assertRaises(ValueError, Deck.modify, self.deck.id, fail)
+        self.assertEqual(Deck.get(self.deck.id).count, 52)
+
+        Deck.modify(self.deck.id, lambda deck: deck.draw(5))
+        self.assertEqual(deck_cache.get(self.deck.id).count, 47)
+
+    def test_conflict(self):
+        deck, stale_deck = Deck.get(self.deck.id), Deck.get(self.deck.id)
+        deck.draw()
+        deck.save()
+        stale_deck.draw()
+        self.assertRaises(ConcurrentModificationException, stale_deck.save)
+
+        # the next get reads the saved deck
+        self.assertIsNone(deck_cache.get(self.deck.id))
+        self.assertEqual(Deck.get(self.deck.id).cards, deck.cards)
+
+    def test_eviction(self):
+        decks = [DeckModel.create_deck() for _ in range(3)]
+        cache = DeckCache(max_decks=2, max_cards=52 * 3)
+        for deck in decks:
+            cache.put(deck)
+            cache.get(decks[0].id)
+
+        # the least recently used deck is evicted first
+        self.assertIsNone(cache.get(decks[1].id))
+        self.assertEqual(len(cache), 2)
+
+        # and decks are evicted to keep the total card count
+        cache.put(DeckModel.create_deck(n=2))
+        self.assertEqual((len(cache), cache.cards), (2, 156))
+        self.assertIsNone(cache.get(decks[2].id))
+        self.assertIsNotNone(cache.get(decks[0].id))
+
+        self.assertIsNone(DeckCache(max_decks=0).put(self.deck))
+
+    def test_timeout(self):
+        now = [0]
+        cache = DeckCache(timeout=10, clock=lambda: now[0])
+        cache.put(self.deck)
+
+        now[0] = 9
+        self.assertEqual(cache.get(self.deck.id).cards, self.deck.cards)
+        now[0] = 10
+        self.assertIsNone(cache.get(self.deck.id))
+        self.assertEqual((cache.hits, cache.misses, cache.cards), (1, 1, 0))
+
+
+class TestCacheDeckStore(TransactionTestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.database_store = models.deck_store
+        self.store = models.deck_store = CacheDeckStore(
+            cache='decks', clock=lambda: self.now)
+        self.store.cache.clear()
+        self.deck = DeckModel.create_deck()
+
+    def tearDown(self):
+        models.deck_store = self.database_store
+
+    def get(self, id):
+        deck_cache.clear()
+        return Deck.get(id)
+
+    def test_write_through(self):
+        deck = self.get(self.deck.id)
+        deck.discard(deck.draw(n=2))
+        deck.save()
+
+        # other processes read the saved deck from the cache
+        with self.assertNumQueries(0):
+            deck = self.get(self.deck.id)
+            self.assertEqual(deck.cards, self.deck.cards[:-2])
+            self.assertEqual(deck.pile.count(), 2)
+
+        self.assertEqual(DeckModel.objects.get(pk=self.deck.id).count, 50)
+
+        # decks which are not cached are read from the database
+        self.store.cache.clear()
+        self.assertEqual(self.get(self.deck.id).count, 50)
+        self.assertIsNotNone(self.store.cache.get(self.store._key(deck.id)))
+
+        deck.delete()
+        self.assertRaises(NoSuchDeckException, self.get, self.deck.id)
+
+    def test_write_behind(self):
+        self.store.write_behind = 10
+
+        # saves within write_behind seconds only write to the cache
+        deck = self.get(self.deck.id)
+        deck.draw()
+        with self.assertNumQueries(0):
+            deck.save()
+        self.assertEqual(self.get(self.deck.id).count, 51)
+        self.assertEqual(DeckModel.objects.get(pk=self.deck.id).count, 52)
+
+        stale_deck = self.get(self.deck.id)
+        stale_deck.draw()
+        deck.draw()
+        deck.save()
+        self.assertRaises(ConcurrentModificationException, stale_deck.save)
+
+        # and later saves bring the row up to date
+        self.now = 10
+        deck.draw()
+        deck.save()
+        deck_model = DeckModel.objects.get(pk=self.deck.id)
+        self.assertEqual((deck_model.count, deck_model.version), (49, 3))
+
+    def test_flush(self):
+        self.store.write_behind = 10
+
+        # decks saved and then left alone are written by a flush
+        deck = self.get(self.deck.id)
+        deck.draw(n=3)
+        deck.save()
+        self.assertEqual(DeckModel.objects.get(pk=self.deck.id).count, 52)
+
+        self.assertEqual(self.store.flush(), 1)
+        deck_model = DeckModel.objects.get(pk=self.deck.id)
+        self.assertEqual((deck_model.count, deck_model.version), (49, 1))
+        self.assertEqual(self.store.flush(), 0)
+
+        deck = self.get(self.deck.id)
+        deck.draw()
+        deck.save()
+        call_command('flush_decks')
+        self.assertEqual(DeckModel.objects.get(pk=self.deck.id).count, 48)
+
+        # decks deleted from the database are dropped, not written
+        deck = self.get(self.deck.id)
+        deck.draw()
+        deck.save()
+        DeckModel.objects.filter(pk=self.deck.id).delete()
+        self.assertEqual(self.store.flush(), 0)
+        self.assertRaises(NoSuchDeckException, self.get, self.deck.id)
+
+        # and so are saves over a row which was deleted
+        deck = DeckModel.create_deck()
+        self.now = 20
+        deck.draw()
+        deck.save()
+        self.now = 30
+        DeckModel.objects.filter(pk=deck.id).delete()
+        deck.draw()
+        self.assertRaises(ConcurrentModificationException, deck.save)
+        self.assertRaises(NoSuchDeckException, self.get, deck.id)
+
+    def test_rollback(self):
+        def fail(deck):
+            deck.draw(5)
+            deck.save()
+            raise ValueError
+
+        for write_behind in (None, 10):
+            self.store.write_behind = write_behind
+            self.store.cache.clear()
+            deck = DeckModel.create_deck()
+
+            # saves rolled back are never shared
+            self.assertRaises(ValueError, Deck.modify, deck.id, fail)
+            self.assertEqual(self.get(deck.id).count, 52)
+
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    deck = self.get(deck.id)
+                    deck.draw(5)
+                    deck.save()
+                    raise ValueError
+            self.assertEqual(self.get(deck.id).count, 52)
+
+            # and saves committed are shared once they commit
+            Deck.modify(deck.id, lambda deck: deck.draw(5))
+            with self.assertNumQueries(0):
+                self.assertEqual(self.get(deck.id).count, 47)
+            self.assertIsNone(self.store.cache.get(
+                self.store._key(deck.id) + ':lock'))
+
+        # decks created in a transaction are cached once they are read
+        deck = DeckModel.create_decks(1)[0]
+        self.assertIsNone(self.store.cache.get(self.store._key(deck.id)))
+        self.assertEqual(self.get(deck.id).count, 52)
+
+
+# SQLite's in-memory test database cannot be shared between threads on
+# Python 2, so the local settings give the test database a TEST NAME
+THREADS_SHARE_DATABASE = not (
+    connection.vendor == 'sqlite' and
+    not connection.features.can_share_in_memory_db and
+    not connection.settings_dict['TEST'].get('NAME'))
+
+
+class TestConcurrency(TransactionTestCase):
+
+    def setUp(self):
+        self.deck = DeckModel.create_deck()
+
+    def test_stale_save(self):
+        deck, stale_deck = Deck.get(self.deck.id), Deck.get(self.deck.id)
+        deck.draw()
+        deck.save()
+
+        stale_deck.draw()
+        self.assertRaises(ConcurrentModificationException, stale_deck.save)
+        self.assertEqual(Deck.get(self.deck.id).count, 51)
+
+    def test_modify(self):
+        stale_deck = Deck.get(self.deck.id)
+        card = Deck.modify(self.deck.id, lambda deck: deck.draw())
+        self.assertEqual(card, stale_deck.draw())
+
+        # nothing is saved when the operation fails
+        def draw_too_many(deck):
+            deck.discard(deck.draw())
+            deck.draw(n=100)
+
+        self.assertRaises(NotEnoughCardsException, Deck.modify,
+                          self.deck.id, draw_too_many)
+        deck = Deck.get(self.deck.id)
+        self.assertEqual(deck.count, 51)
+        self.assertEqual(deck.pile.count(), 0)
+
+    def deal(self, lock):
+        dealt = []
+
+        def player():
+            try:
+                while True:
+                    try:
+                        dealt.append(Deck.modify(self.deck.id,
+                                                 lambda deck: deck.draw(),
+                                                 lock=lock, retries=1000))
+                    except NotEnoughCardsException:
+                        return
+            finally:
+                connection.close()
+
+        players = [threading.Thread(target=player) for _ in range(8)]
+        for thread in players:
+            thread.start()
+        for thread in players:
+            thread.join()
+
+        return dealt
+
+    @unittest.skipUnless(THREADS_SHARE_DATABASE,
+                         "the test database is not shared between threads")
+    def test_concurrent_draws(self):
+        # no card is dealt twice, and none is lost
+        for lock in (False, True):
+            self.deck = DeckModel.create_deck()
+            dealt = self.deal(lock)
+            self.assertEqual(sorted(card.ordinal for card in dealt),
+                             range(52))
+            self.assertEqual(Deck.get(self.deck.id).count, 0)
+
+
 class TestPile(TestCase):
 
     def setUp(self):
@@ -223,3 +919,211 @@ class TestPile(TestCase):
 
         from_pile = deck.draw(7, from_pile="foo")
         self.assertEqual(len(from_pile), 7)
+
+    def test_dumps_names(self):
+        # pile names which are not strings are written as string keys
+        self.pile.push(self.deck.draw(2), into=5)
+        for dumped in (dumps_pile(self.pile),
+                       b''.join(iter_pile(self.pile)),
+                       dumps_packed_pile(*pack_pile(self.pile))):
+            self.assertEqual(len(json.loads(dumped).get("5")), 2)
+
+    def test_draw_removes_cards(self):
+        cards = self.deck.draw(5)
+        self.pile.push(cards)
+        self.assertEqual(self.pile.count(), 5)
+
+        drawn = self.pile.draw(2)
+        self.assertEqual([c.ordinal for c in drawn],
+                         [c.ordinal for c in reversed(cards[3:])])
+        self.assertEqual(self.pile.count(), 3)
+        self.assertEqual([c.ordinal for c in self.pile.show()],
+                         [c.ordinal for c in cards[:3]])
+        self.assertEqual(self.pile.draw(0), [])
+        self.assertRaises(NotEnoughCardsException, self.pile.draw, 4)
+        self.assertRaises(Exception, self.pile.draw, 1, "nothing")
+
+    def test_push_is_validated(self):
+        cards = self.deck.draw(3)
+        self.assertRaises(Exception, self.pile.push, cards + ["not a card"])
+        self.assertRaises(Exception, self.pile.push, 7)
+        self.assertRaises(Exception, self.pile.push, cards, into=["foo"])
+        self.assertEqual(self.pile.count(), 0)
+
+        self.pile.push(cards[0])
+        self.pile.push(iter(cards[1:]), into="foo")
+        self.assertEqual(self.pile.counts(), {"discard": 1, "foo": 2})
+
+    def test_large_piles(self):
+        deck = Deck(n=200)
+        deck.discard(deck.draw(deck.count))
+        self.assertEqual(deck.pile.count(), 200 * 52)
+
+        copied = copy.copy(deck.pile)
+        self.assertEqual(len(deck.pile.draw(10000)), 10000)
+        self.assertEqual(deck.pile.count(), 400)
+        self.assertEqual(copied.count(), 200 * 52)
+
+        unpacked = unpack_pile(*pack_pile(copied))
+        self.assertEqual(unpacked.counts(), copied.counts())
+        self.assertEqual(unpacked.ordinals, copied.ordinals)
+
+
+class TestEvaluate(TestCase):
+
+    @staticmethod
+    def hand(*cards):
+        return [Card(rank, suit).ordinal for rank, suit in cards]
+
+    def test_poker_rank(self):
+        hands = [
+            ("high card", [(9, "Hearts"), (8, "Spades"), (2, "Clubs"),
+                           (3, "Diamonds"), (5, "Hearts")]),
+            ("pair", [(9, "Hearts"), (9, "Spades"), (2, "Clubs"),
+                      (3, "Diamonds"), (5, "Hearts")]),
+            ("two pair", [(9, "Hearts"), (9, "Spades"), (2, "Clubs"),
+                          (2, "Diamonds"), (5, "Hearts"), (5, "Spades")]),
+            ("three of a kind", [(9, "Hearts"), (9, "Spades"), (9, "Clubs"),
+                                 (2, "Diamonds"), (5, "Hearts")]),
+            ("straight", [("Ace", "Clubs"), (2, "Hearts"), (3, "Hearts"),
+                          (4, "Diamonds"), (5, "Hearts")]),
+            ("flush", [(9, "Hearts"), (3, "Hearts"), (7, "Hearts"),
+                       (2, "Hearts"), ("King", "Hearts"), (2, "Clubs")]),
+            ("full house", [(9, "Hearts"), (9, "Spades"), (9, "Clubs"),
+                            (2, "Diamonds"), (2, "Hearts"), (2, "Clubs"),
+                            (5, "Spades")]),
+            ("four of a kind", [(9, "Hearts"), (9, "Spades"), (9, "Clubs"),
+                                (9, "Diamonds"), (2, "Hearts")]),
+            ("straight flush", [("Ace", "Hearts"), (2, "Hearts"),
+                                (3, "Hearts"), (4, "Hearts"), (5, "Hearts"),
+                                (9, "Clubs"), (9, "Diamonds")]),
+        ]
+        scores = [evaluate.poker_rank(self.hand(*cards))
+                  for name, cards in hands]
+
+        self.assertEqual([evaluate.category(score) for score in scores],
+                         [name for name, cards in hands])
+        self.assertEqual(scores, sorted(scores))
+
+        # kickers break ties, and suits never do
+        self.assertGreater(
+            evaluate.poker_rank(self.hand((9, "Hearts"), (9, "Spades"),
+                                          ("Ace", "Clubs"))),
+            evaluate.poker_rank(self.hand((9, "Clubs"), (9, "Diamonds"),
+                                          ("King", "Clubs"))))
+        self.assertEqual(
+            evaluate.poker_rank(self.hand(*hands[0][1])),
+            evaluate.poker_rank(self.hand(*[(rank, "Spades") for rank, suit
+                                            in hands[0][1][:4]] +
+                                          [(5, "Clubs")])))
+
+    def test_seven_cards(self):
+        # a seven card hand scores its best five cards
+        rng = random.Random(7)
+        for _ in range(200):
+            hand = rng.sample(range(52), 7)
+            self.assertEqual(evaluate.poker_rank(hand), max(
+                evaluate.poker_rank(five)
+                for five in itertools.combinations(hand, 5)))
+
+    def test_blackjack_totals(self):
+        self.assertEqual(evaluate.blackjack_totals(
+            self.hand(("Ace", "Hearts"), (6, "Spades"))), (7, 17))
+        self.assertEqual(evaluate.blackjack_totals(
+            self.hand(("Ace", "Hearts"), (6, "Spades"), ("King", "Clubs"))),
+            (17, None))
+        self.assertEqual(evaluate.blackjack_totals(
+            self.hand(("Ace", "Hearts"), ("Ace", "Spades"))), (2, 12))
+        self.assertEqual(evaluate.blackjack_totals([]), (0, None))
+
+    def test_evaluate_many(self):
+        deck = Deck(n=2, seed=3)
+        for seat in range(20):
+            deck.discard(deck.draw(5), into="seat {}".format(seat))
+        piles = deck.pile.ordinals
+
+        self.assertEqual(evaluate.evaluate_many(piles.values()),
+                         [evaluate.poker_rank(pile) for pile in
+                          piles.values()])
+        self.assertEqual(evaluate.evaluate(piles["seat 0"])["count"], 5)
+        self.assertEqual(evaluate.evaluate([])['category'], None)
+
+
+def poker_category(ordinals):
+    return evaluate.category(evaluate.poker_rank(ordinals))
+
+
+class TestSimulate(TestCase):
+
+    def test_deal_batch(self):
+        deals = simulate.deal_batch(2, 104, 3, seed=1)
+        self.assertEqual(len(deals), 3)
+        for deal in deals:
+            self.assertEqual(sorted(deal), sorted(list(range(52)) * 2))
+
+        deals = simulate.deal_batch(8, 7, 100, seed=1)
+        self.assertEqual(set(map(len, deals)), set([7]))
+        self.assertEqual(deals, simulate.deal_batch(8, 7, 100, seed=1))
+        self.assertRaises(Exception, simulate.deal_batch, 1, 53, 1)
+
+    def test_run(self):
+        counts = simulate.run(poker_category, 5000, deal=5, batch_size=1000,
+                              workers=0, seed=4)
+        self.assertEqual(sum(counts.values()), 5000)
+        self.assertGreater(simulate.probability(counts, "pair"), 0.35)
+        self.assertLess(simulate.probability(counts, "pair"), 0.5)
+
+        # a seeded run counts the same outcomes in any number of workers
+        self.assertEqual(simulate.run(poker_category, 5000, deal=5,
+                                      batch_size=1000, workers=2, seed=4),
+                         counts)
+
+
+@unittest.skipIf(batch.numpy is None, "deck.batch requires NumPy")
+class TestBatch(TestCase):
+
+    def test_deal(self):
+        decks, hands = batch.deal(100, hands=4, size=2, n=2, seed=5)
+        self.assertEqual(decks.shape, (100, 104))
+        self.assertEqual(hands.shape, (100, 4, 2))
+
+        # the hands are views of the top of each deck, from the top down
+        self.assertTrue(batch.numpy.may_share_memory(hands, decks))
+        self.assertEqual(hands[7].ravel().tolist(),
+                         decks[7, ::-1][:8].tolist())
+
+        fresh = sorted(Deck(n=2, shuffle=False).ordinals)
+        for row in decks:
+            self.assertEqual(sorted(row.tolist()), fresh)
+
+        again = batch.deal(batch.new(100, n=2), hands=4, size=2, seed=5)[0]
+        self.assertEqual(again.tolist(), decks.tolist())
+        self.assertRaises(Exception, batch.deal, 1, hands=11, size=5)
+
+    def test_conversion(self):
+        decks, hands = batch.deal(10, hands=2, size=5, seed=6)
+
+        cards = batch.to_cards(hands[3, 1])
+        self.assertEqual([card.ordinal for card in cards],
+                         hands[3, 1].tolist())
+
+        deck = batch.to_deck(decks[3], dealt=10)
+        self.assertEqual(deck.count, 42)
+        self.assertEqual(list(deck.ordinals), decks[3, :42].tolist())
+        self.assertEqual([card.ordinal for card in deck.draw(2)],
+                         decks[3, 40:42][::-1].tolist())
+
+    def test_shared_shuffle(self):
+        # batches and simulations shuffle rows the same way, in chunks of at
+        # most shuffles.MAX_KEYS keys
+        max_keys, shuffles.MAX_KEYS = shuffles.MAX_KEYS, 1000
+        try:
+            # position p of the shoes simulate deals from holds ordinal p % 52
+            shoes = batch.numpy.arange(104, dtype=batch.numpy.uint8) % 52
+            decks = batch.shuffle(batch.numpy.tile(shoes, (50, 1)), seed=8)
+            self.assertEqual(simulate.deal_batch(2, 104, 50, seed=8),
+                             decks.tolist())
+            self.assertEqual(simulate.deal_batch(2, 3, 50, seed=8),
+                             decks[:, :3].tolist())
+        finally:
+            shuffles.MAX_KEYS = max_keys